@@ -0,0 +1,72 @@
+"""Compare text and binary grid array input for a large model.
+
+Creates the same model twice, once with text arrays and once with binary
+arrays, and measures the time to write the input and the time MF6
+needs to initialize the model, i.e. to read all input.
+
+Usage:
+
+    python binary_input.py [nrow ncol nlay]
+"""
+
+from contextlib import redirect_stdout
+from io import StringIO
+import sys
+from timeit import default_timer
+
+import numpy as np
+
+from pymf6.mf6 import MF6
+from pymf6.modeling_tools.base_model import make_model_data
+from pymf6.modeling_tools.make_model import make_input
+
+
+def make_data(model_path, nrow, ncol, nlay):
+    """Model data for a grid with random hydraulic conductivity."""
+    rng = np.random.default_rng(42)
+    shape = (nlay, nrow, ncol)
+    return make_model_data({
+        'name': 'bench',
+        'model_path': model_path,
+        'nrow': nrow,
+        'ncol': ncol,
+        'nlay': nlay,
+        'top': 10.0,
+        'botm': np.linspace(0, 10, nlay + 1)[-2::-1],
+        'k': rng.lognormal(0, 1, shape),
+        'k33': rng.lognormal(-2, 1, shape),
+        'chd': [[(0, 0, 0), 1.], [(0, nrow - 1, ncol - 1), 1.]],
+        'wells': {
+            'wel_out': {'q': (-0.05, -0.5, -0.05), 'coords': (0, nrow // 2, ncol // 2)},
+        },
+    })
+
+
+def measure(model_path, nrow, ncol, nlay, binary_arrays):
+    """Time writing and MF6 initialization of one model."""
+    model_data = make_data(model_path, nrow, ncol, nlay)
+    start = default_timer()
+    make_input(model_data, binary_arrays=binary_arrays)
+    write_time = default_timer() - start
+    start = default_timer()
+    with redirect_stdout(StringIO()):
+        mf6 = MF6(model_path, advance_first_step=False)
+    init_time = default_timer() - start
+    mf6.finalize()
+    return write_time, init_time
+
+
+def main(nrow=1000, ncol=1000, nlay=3):
+    """Run the benchmark and show the results."""
+    results = {
+        'text': measure('models/bench_text', nrow, ncol, nlay, False),
+        'binary': measure('models/bench_binary', nrow, ncol, nlay, True),
+    }
+    print(f'grid: {nlay} x {nrow} x {ncol} = {nlay * nrow * ncol} cells')
+    print(f'{"input":>8} {"write (s)":>10} {"MF6 init (s)":>13}')
+    for name, (write_time, init_time) in results.items():
+        print(f'{name:>8} {write_time:10.2f} {init_time:13.2f}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,123 @@
+"""Compare synchronous and lagged asynchronous control.
+
+Runs the same model twice with an expensive controller that sets the rate
+of one well from the heads around it:
+
+* synchronous: the controller is computed at the start of each time step
+  from the current heads
+* lagged: the controller is computed in a worker thread from the heads at
+  the end of step n while MF6 solves step n + 1, the result is applied at
+  the start of step n + 2 (see `pymf6.controllers.LaggedController`)
+
+The wall time of the lagged run is shorter by up to the smaller of the
+controller time and the solve time per step.
+
+Usage:
+
+    python lagged_control.py [nrow ncol controller_size]
+"""
+
+from contextlib import redirect_stdout
+from io import StringIO
+import sys
+from timeit import default_timer
+
+import numpy as np
+
+from pymf6.api import States
+from pymf6.controllers import LaggedController, snapshot_x
+from pymf6.mf6 import MF6
+from pymf6.modeling_tools.base_model import make_model_data
+from pymf6.modeling_tools.make_model import make_input
+
+MODEL_NAME = 'lagged'
+HEAD_LIMIT = 0.5
+
+
+def make_data(model_path, nrow, ncol):
+    """Model data for a grid with one extraction well in the center."""
+    return make_model_data({
+        'name': MODEL_NAME,
+        'model_path': model_path,
+        'nrow': nrow,
+        'ncol': ncol,
+        'chd': [[(0, 0, 0), 1.], [(0, nrow - 1, ncol - 1), 1.]],
+        'wells': {
+            'wel_out': {
+                'q': (-0.05, -0.5, -0.05), 'coords': (0, nrow // 2, ncol // 2)
+            },
+        },
+    })
+
+
+class ExpensiveController:
+    """
+    Well rate from a weighted mean of all heads.
+
+    The matrix product stands in for an expensive calculation such as an
+    analytic element model. NumPy releases the GIL while it runs.
+    """
+
+    def __init__(self, size, q_max=-0.5):
+        rng = np.random.default_rng(42)
+        matrix = rng.random((size, size))
+        # Rows sum to one, i.e. each product gives weighted means.
+        self.matrix = matrix / matrix.sum(axis=1, keepdims=True)
+        self.q_max = q_max
+
+    def compute(self, snapshot):
+        """New rate from a snapshot, runs without MF6 access."""
+        heads = snapshot['x'][MODEL_NAME.upper()]
+        vector = np.resize(heads, len(self.matrix))
+        for _ in range(5):
+            vector = self.matrix @ vector
+        mean_head = vector.mean()
+        fraction = np.clip((mean_head - HEAD_LIMIT) / HEAD_LIMIT, 0, 1)
+        return self.q_max * fraction
+
+    @staticmethod
+    def apply(model_step, rate):
+        """Write the rate into the well package."""
+        mf6 = model_step.simulation_group.mf6
+        bound = mf6.get_value_ptr(f'{MODEL_NAME.upper()}/WEL_0/BOUND')
+        bound[0, 0] = rate
+
+
+def run(model_path, controller, lagged):
+    """Run the model with the controller and return the wall time."""
+    with redirect_stdout(StringIO()):
+        mf6 = MF6(model_path, advance_first_step=False)
+    start = default_timer()
+    if lagged:
+        with LaggedController(controller.compute, controller.apply) as lag:
+            for model_step in mf6.model_loop():
+                lag(model_step)
+        wait_time = lag.wait_time
+    else:
+        for model_step in mf6.model_loop():
+            if model_step.state == States.timestep_start:
+                rate = controller.compute(snapshot_x(model_step))
+                controller.apply(model_step, rate)
+        wait_time = 0.0
+    return default_timer() - start, wait_time
+
+
+def main(nrow=200, ncol=200, controller_size=2000):
+    """Run the benchmark and show the results."""
+    model_path = 'models/lagged'
+    make_input(make_data(model_path, nrow, ncol))
+    controller = ExpensiveController(controller_size)
+    results = {
+        'synchronous': run(model_path, controller, lagged=False),
+        'lagged': run(model_path, controller, lagged=True),
+    }
+    print(f'grid: {nrow} x {ncol}, controller matrix: {controller_size}')
+    print(f'{"mode":>12} {"wall (s)":>9} {"waiting (s)":>12}')
+    for name, (wall_time, wait_time) in results.items():
+        print(f'{name:>12} {wall_time:9.2f} {wait_time:12.2f}')
+    saved = results['synchronous'][0] - results['lagged'][0]
+    print(f'saved: {saved:.2f} s')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -1,10 +1,20 @@
 """modflowapi interface."""
 
 from enum import Enum
+from time import perf_counter
 
 from modflowapi import ModflowApi
 from modflowapi.extensions.apisimulation import ApiSimulation
 
+from .instrumentation import SolveStats
+from .predictor import Predictor
+from .tracing import TracedApi
+
+
+def _no_clock():
+    """Clock used without timing, all durations are zero."""
+    return 0.0
+
 
 class States(Enum):
     """States of MODFLOW API."""
@@ -42,6 +52,10 @@ class Simulator:
         sim_path,
         verbose=False,
         do_solution_loop=True,
+        predictor=None,
+        tracer=None,
+        run_log=None,
+        timing=False,
         _develop=False,
     ):
         """
@@ -55,6 +69,18 @@ class Simulator:
             path to the Modflow6 simulation
         verbose : bool
             flag for verbose output from the simulation runner
+        do_solution_loop : bool
+            yield also for stress periods and outer iterations
+        predictor : str or Predictor
+            `'linear'` or `'quadratic'` extrapolation of X at the
+            start of each time step, needs `do_solution_loop`
+        tracer : Tracer
+            record a timeline of the MF6 phases and the user code
+        run_log : RunLog
+            write an event for each time step and update the metrics
+        timing : bool
+            record solve time, user time, and maximum change of X for
+            each time step in `stats`, always on with `run_log`
         _develop : bool
             flag that dumps a list of all mf6 api variable addresses to text
             file named "var_list.txt". This is primarily used for extensions
@@ -64,6 +90,15 @@ class Simulator:
         """
         self.verbose = verbose
         self.do_solution_loop = do_solution_loop
+        if isinstance(predictor, str):
+            predictor = Predictor(predictor)
+        if predictor is not None and not do_solution_loop:
+            raise ValueError('A predictor needs `do_solution_loop=True`.')
+        self.predictor = predictor
+        self.tracer = tracer
+        self.run_log = run_log
+        self.timing = timing or run_log is not None
+        self._clock = perf_counter if self.timing else _no_clock
         self._develop = _develop
         self._mf6 = ModflowApi(
             dll,
@@ -73,6 +108,9 @@ class Simulator:
         self.api = ApiSimulation.load(self._mf6)
         self._sim_grp = None
         self.sol_old_kper = {}
+        self.stats = SolveStats.from_mf6(
+            self._mf6, self.api.subcomponent_count
+        )
 
     def loop(self):
         """
@@ -80,17 +118,39 @@ class Simulator:
 
         Provides simulation group and state for each times step.
         """
-        mf6 = self._mf6
+        if self.tracer is None:
+            return self._loop(self._mf6)
+        return self.tracer.trace_loop(
+            self._loop(TracedApi(self._mf6, self.tracer))
+        )
+
+    def _loop(self, mf6):
+        """Loop over all time steps with `mf6` as API object."""
         verbose = self.verbose
         sim = self.api
+        stats = self.stats
+        run_log = self.run_log
+        clock = self._clock
 
         current_time = mf6.get_current_time()
         end_time = mf6.get_end_time()
         kperold = [0 for _ in range(sim.subcomponent_count)]
+        if run_log is not None:
+            run_log.metrics['pymf6_end_time'] = end_time
+            run_log.metrics['pymf6_running'] = 1
+            run_log.event(
+                'simulation_start',
+                end_time=end_time,
+                solutions=sim.subcomponent_count,
+                time_steps=stats.capacity,
+            )
 
         while current_time < end_time:
             dt = mf6.get_time_step()  # pylint: disable=invalid-name
             mf6.prepare_time_step(dt)
+            step = stats.start_step(
+                sim.kper, sim.kstp, mf6.get_current_time()
+            )
 
             if verbose:
                 print(
@@ -105,74 +165,149 @@ class Simulator:
                     kperold=kperold,
                 )
             else:
+                start = clock()
                 yield sim, States.timestep_start
+                stats.user_time[step, 0] += clock() - start
+                start = clock()
                 mf6.do_time_step()
+                stats.solve_time[step, 0] = clock() - start
+                if self.timing:
+                    for model in sim.models:
+                        stats.record_change(
+                            mf6, [model.name], model.solution_id - 1
+                        )
+                start = clock()
                 yield sim, States.timestep_end
+                stats.user_time[step, 0] += clock() - start
             mf6.finalize_time_step()
+            if run_log is not None:
+                run_log.log_step(stats)
             current_time = mf6.get_current_time()
         try:
             mf6.finalize()
         except Exception as err:
             msg = 'MF6 simulation failed, check listing file'
+            if run_log is not None:
+                run_log.metrics['pymf6_running'] = 0
+                run_log.event('simulation_failed', message=msg)
             raise RuntimeError(msg) from err
+        if run_log is not None:
+            run_log.metrics['pymf6_running'] = 0
+            run_log.event(
+                'simulation_end',
+                time_steps=stats.nsteps,
+                iterations=int(
+                    stats.iterations[:stats.nsteps].clip(min=0).sum()
+                ),
+                not_converged=int(
+                    (
+                        ~stats.converged[:stats.nsteps]
+                        & (stats.iterations[:stats.nsteps] >= 0)
+                    ).sum()
+                ),
+            )
         if self.verbose:
             print('NORMAL TERMINATION OF SIMULATION')
+            if self.predictor is not None:
+                print(self.predictor.summary())
+            print(self.stats.summary())
 
     def _solutions_loop(self, sim, mf6, current_time, kperold):
         """Sub loop over solutions."""
         has_converged = False
+        stats = self.stats
+        step = stats.step
+        clock = self._clock
         for sol_id, slnobj in sorted(sim.solutions.items()):
             models = {}
             maxiter = slnobj.mxiter
             solution = {sol_id: slnobj}
+            sol_index = sol_id - 1
             for model in sim.models:
                 if sol_id == model.solution_id:
                     models[model.name.lower()] = model
 
             sim_grp = ApiSimulation(
                 # pylint: disable=protected-access
-                mf6,
+                self._mf6,
                 models,
                 solution,
                 sim._exchanges,
                 sim.tdis,
                 sim.ats,
             )
+            user_time = 0.0
+            solve_time = 0.0
             mf6.prepare_solve(sol_id)
             if sim.kper != kperold[sol_id - 1]:
+                start = clock()
                 yield sim_grp, States.stress_period_start
+                user_time += clock() - start
                 kperold[sol_id - 1] += 1
             elif current_time == 0:
+                start = clock()
                 yield sim_grp, States.stress_period_start
+                user_time += clock() - start
 
             kiter = 0
+            predicted = False
+            if self.predictor is not None:
+                predicted = self.predictor.predict(mf6, sim_grp)
+            start = clock()
             yield sim_grp, States.timestep_start
+            user_time += clock() - start
 
             if sim_grp.ats_period[0]:
                 mindt = sim_grp.ats_period[-1]
                 while sim_grp.delt > mindt:
                     sim_grp.iteration = kiter
+                    start = clock()
                     yield sim_grp, States.iteration_start
+                    user_time += clock() - start
+                    start = clock()
                     has_converged = mf6.solve(sol_id)
+                    solve_time += clock() - start
+                    start = clock()
                     yield sim_grp, States.iteration_end
+                    user_time += clock() - start
                     kiter += 1
                     if has_converged and sim_grp.allow_convergence:
                         break
             else:
                 while kiter < maxiter:
                     sim_grp.iteration = kiter
+                    start = clock()
                     yield sim_grp, States.iteration_start
+                    user_time += clock() - start
+                    start = clock()
                     has_converged = mf6.solve(sol_id)
+                    solve_time += clock() - start
+                    start = clock()
                     yield sim_grp, States.iteration_end
+                    user_time += clock() - start
                     kiter += 1
                     if has_converged and sim_grp.allow_convergence:
                         break
+            stats.iterations[step, sol_index] = kiter
+            stats.converged[step, sol_index] = has_converged
+            stats.solve_time[step, sol_index] = solve_time
+            if self.timing:
+                stats.record_change(mf6, models, sol_index)
+            if self.predictor is not None:
+                self.predictor.store(
+                    mf6, sim_grp, sol_id, kiter, predicted, has_converged
+                )
+            start = clock()
             yield sim_grp, States.timestep_end
+            user_time += clock() - start
             mf6.finalize_solve(sol_id)
             old_kper = self.sol_old_kper.get(sol_id, 0)
             if old_kper < sim_grp.kper:
                 self.sol_old_kper[sol_id] = sim_grp.kper
+                start = clock()
                 yield sim_grp, States.stress_period_end
+                user_time += clock() - start
+            stats.user_time[step, sol_index] = user_time
 
         if not has_converged:
             print(f'Simulation group: {sim_grp} DID NOT CONVERGE')
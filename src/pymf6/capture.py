@@ -0,0 +1,164 @@
+"""Capture console output of MF6 at the file-descriptor level.
+
+MF6 writes with Fortran I/O directly to the file descriptors 1 and 2.
+Therefore, `contextlib.redirect_stdout` does not capture this output.
+`OutputCapture` replaces the file descriptors with a pipe that is drained
+by a background thread. The output can be:
+
+* kept in memory, only the last `tail` lines
+* written to a file
+* shown in the terminal, with at most `max_lines_per_second` lines
+* discarded, only the last lines and the counts are kept
+
+If an exception occurs inside the `with` block, the last lines are shown
+on the original standard error.
+
+Usage example:
+
+>>> with OutputCapture(path='mf6_output.txt') as capture:
+...     mf6 = MF6('path/to/sim')
+...     for model_step in mf6.model_loop():
+...         pass
+>>> capture.lines_total
+"""
+
+from collections import deque
+import os
+import sys
+from threading import Thread
+import time
+
+# Read from the pipe in blocks of this size.
+READ_SIZE = 64 * 1024
+
+
+class OutputCapture:
+    """
+    Redirect file descriptors 1 and 2 into a pipe.
+
+    `path` - file for all captured output, `None` for no file
+    `tail` - number of last lines to keep in memory
+    `echo` - show the output in the terminal
+    `max_lines_per_second` - limit of lines shown with `echo`,
+                             `None` for no limit
+    `discard` - neither write nor show output, keep only the last lines
+    `show_tail_on_error` - show the last lines if the `with` block fails
+    `fds` - file descriptors to capture
+    """
+
+    def __init__(
+            self,
+            path=None,
+            tail=100,
+            echo=False,
+            max_lines_per_second=None,
+            discard=False,
+            show_tail_on_error=True,
+            fds=(1, 2)):
+        self.path = path
+        self.echo = echo and not discard
+        self.write_file = path is not None and not discard
+        self.max_lines_per_second = max_lines_per_second
+        self.show_tail_on_error = show_tail_on_error
+        self.fds = fds
+        self.tail_lines = deque(maxlen=tail)
+        self.lines_total = 0
+        self.lines_suppressed = 0
+        self._saved_fds = {}
+        self._read_fd = None
+        self._thread = None
+        self._echo_fd = None
+        self._window_start = 0.0
+        self._window_count = 0
+
+    @property
+    def tail(self):
+        """Last captured lines."""
+        return list(self.tail_lines)
+
+    def _allow_echo(self):
+        """Rate limit for lines shown in the terminal."""
+        if self.max_lines_per_second is None:
+            return True
+        now = time.monotonic()
+        if now - self._window_start >= 1:
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+        return self._window_count <= self.max_lines_per_second
+
+    def _handle_lines(self, lines, fobj):
+        for line in lines:
+            self.lines_total += 1
+            self.tail_lines.append(
+                line.decode('utf-8', errors='replace').rstrip('\r')
+            )
+            if self.echo:
+                if self._allow_echo():
+                    os.write(self._echo_fd, line + b'\n')
+                else:
+                    self.lines_suppressed += 1
+        if fobj is not None:
+            fobj.write(b'\n'.join(lines) + b'\n')
+
+    def _drain(self):
+        fobj = open(self.path, 'wb') if self.write_file else None
+        partial = b''
+        try:
+            while chunk := os.read(self._read_fd, READ_SIZE):
+                lines = (partial + chunk).split(b'\n')
+                partial = lines.pop()
+                if lines:
+                    self._handle_lines(lines, fobj)
+            if partial:
+                self._handle_lines([partial], fobj)
+        finally:
+            os.close(self._read_fd)
+            if fobj is not None:
+                fobj.close()
+
+    def start(self):
+        """Start capturing."""
+        sys.stdout.flush()
+        sys.stderr.flush()
+        read_fd, write_fd = os.pipe()
+        for fd in self.fds:
+            self._saved_fds[fd] = os.dup(fd)
+            os.dup2(write_fd, fd)
+        os.close(write_fd)
+        self._read_fd = read_fd
+        self._echo_fd = self._saved_fds.get(1, next(iter(
+            self._saved_fds.values()
+        )))
+        self._thread = Thread(target=self._drain, name='pymf6-capture')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Restore the file descriptors and wait for the remaining output."""
+        if self._thread is None:
+            return
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # Restoring closes the last write ends, i.e. the thread gets EOF.
+        for fd, saved_fd in self._saved_fds.items():
+            os.dup2(saved_fd, fd)
+        self._thread.join()
+        self._thread = None
+        for saved_fd in self._saved_fds.values():
+            os.close(saved_fd)
+        self._saved_fds = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        if exc_type is not None and self.show_tail_on_error:
+            print(
+                f'Last {len(self.tail_lines)} lines of output:',
+                *self.tail_lines,
+                sep='\n',
+                file=sys.stderr,
+            )
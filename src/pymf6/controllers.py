@@ -0,0 +1,388 @@
+"""Registry of controllers acting on a running simulation.
+
+A controller is a callable that takes a `ModelStep`, e.g. a function that
+changes well rates at the start of each time step. `ControllerRegistry`
+calls all registered controllers for each step of `MF6.model_loop` and
+measures the time each one needs.
+
+With `step_budget`, the Python time of all controllers in one time step is
+limited. If the budget is exceeded, a warning is shown and, with
+`on_budget='skip'`, controllers registered with `essential=False` are not
+called for the rest of the time step.
+
+Controllers can be registered with a cadence:
+
+* `states` - states to run in, e.g. only `States.iteration_start`
+* `every` - run only every k-th time step
+* `interval` - run at most once per interval of model time
+* `priority` - controllers with a higher priority run first,
+  controllers with the same priority in the order of registration
+
+The registry keeps a table of controllers per state. Therefore,
+controllers are not called at all for states they do not need.
+
+Usage example:
+
+>>> registry = ControllerRegistry(step_budget=0.01, on_budget='skip')
+>>> registry.register(set_well_rates, states=[States.timestep_start])
+>>> registry.register(
+...     write_plot_data, essential=False, states=[States.timestep_end],
+...     interval=30,
+... )
+>>> report = registry.run(MF6('path/to/sim'))
+
+`LaggedController` runs expensive controllers in a worker thread while
+MF6 solves the next time step.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from warnings import warn
+
+import numpy as np
+import pandas as pd
+
+from .api import States
+
+BUDGET_ACTIONS = ('warn', 'skip')
+# Initial number of stored durations per controller.
+INITIAL_CAPACITY = 1024
+PERCENTILES = (50, 90, 99)
+
+
+class ControllerRegistry:
+    """
+    Call and time controllers for each model step.
+
+    `step_budget` - maximum time in seconds for all controllers in one time
+                    step, `None` for no limit
+    `on_budget` - `'warn'` only warns if the budget is exceeded, `'skip'`
+                  also skips non-essential controllers
+    """
+
+    def __init__(self, step_budget=None, on_budget='warn'):
+        if on_budget not in BUDGET_ACTIONS:
+            raise ValueError(
+                f'Unknown action {on_budget}. Use one of {BUDGET_ACTIONS}.'
+            )
+        self.step_budget = step_budget
+        self.on_budget = on_budget
+        self.controllers = {}
+        self.budget_exceeded = 0
+        self._step = None
+        self._step_count = -1
+        self._step_time = 0.0
+        self._step_exceeded = False
+        self._table = {}
+
+    def register(
+            self,
+            controller,
+            name=None,
+            essential=True,
+            states=None,
+            every=1,
+            interval=None,
+            priority=0):
+        """
+        Add a controller.
+
+        `controller` - callable with a `ModelStep` as argument
+        `name` - unique name, defaults to the name of the callable
+        `essential` - essential controllers are never skipped
+        `states` - states to call the controller in, defaults to all
+        `every` - call the controller only in every `every`-th time step,
+                  starting with the first
+        `interval` - call the controller only in time steps that reach
+                     the next multiple of `interval` in model time, in all
+                     of its `states` of that time step
+        `priority` - controllers with higher priority are called first
+        """
+        if name is None:
+            name = getattr(controller, '__name__', type(controller).__name__)
+        if name in self.controllers:
+            raise ValueError(f'Controller {name} is already registered.')
+        if every < 1:
+            raise ValueError(f'`every` must be at least 1, got {every}.')
+        if interval is not None and interval <= 0:
+            raise ValueError(f'`interval` must be positive, got {interval}.')
+        self.controllers[name] = {
+            'controller': controller,
+            'essential': essential,
+            'states': list(States) if states is None else list(states),
+            'every': every,
+            'interval': interval,
+            'next_time': -np.inf,
+            # Time step of the last `interval` check and its result
+            'interval_step': None,
+            'interval_due': False,
+            'priority': priority,
+            'durations': np.empty(INITIAL_CAPACITY),
+            'call_states': np.empty(INITIAL_CAPACITY, dtype=np.int8),
+            'calls': 0,
+            'skipped': 0,
+        }
+        self._build_table()
+        return controller
+
+    def unregister(self, name):
+        """Remove a controller."""
+        del self.controllers[name]
+        self._build_table()
+
+    def _build_table(self):
+        """Controllers of each state, sorted by priority."""
+        entries = sorted(
+            self.controllers.values(), key=lambda entry: -entry['priority']
+        )
+        self._table = {
+            state.value: [
+                entry for entry in entries if state in entry['states']
+            ]
+            for state in States
+        }
+
+    def _is_due(self, entry, model_step, step):
+        """Check `every` and `interval` of a controller."""
+        if step % entry['every']:
+            return False
+        interval = entry['interval']
+        if interval is None:
+            return True
+        # Decide once per time step, so all states of the step are called.
+        if step == entry['interval_step']:
+            return entry['interval_due']
+        time = model_step.simulation_group.mf6.get_current_time()
+        due = time >= entry['next_time']
+        if due:
+            entry['next_time'] = (np.floor(time / interval) + 1) * interval
+        entry['interval_step'] = step
+        entry['interval_due'] = due
+        return due
+
+    def _current_step(self, model_step):
+        stats = getattr(model_step, 'stats', None)
+        if stats is not None:
+            return stats.step
+        if model_step.state == States.timestep_start:
+            self._step_count += 1
+        return self._step_count
+
+    def _start_step(self, step):
+        if self._step_exceeded:
+            self.budget_exceeded += 1
+            if self.budget_exceeded == 1:
+                warn(
+                    f'Controllers needed {self._step_time:.4f} s in time '
+                    f'step {self._step}, the budget is {self.step_budget} s.'
+                    ' This warning is shown only once, see `report()`.'
+                )
+        self._step = step
+        self._step_time = 0.0
+        self._step_exceeded = False
+
+    def __call__(self, model_step):
+        """Call the controllers of the state of one model step."""
+        step = self._current_step(model_step)
+        if step != self._step:
+            self._start_step(step)
+        budget = self.step_budget
+        for entry in self._table[model_step.state.value]:
+            if (
+                (entry['every'] > 1 or entry['interval'] is not None)
+                and not self._is_due(entry, model_step, step)
+            ):
+                continue
+            if (
+                self._step_exceeded
+                and self.on_budget == 'skip'
+                and not entry['essential']
+            ):
+                entry['skipped'] += 1
+                continue
+            start = perf_counter()
+            entry['controller'](model_step)
+            duration = perf_counter() - start
+            calls = entry['calls']
+            if calls == len(entry['durations']):
+                for key in ['durations', 'call_states']:
+                    entry[key] = np.concatenate(
+                        [entry[key], np.empty_like(entry[key])]
+                    )
+            entry['durations'][calls] = duration
+            entry['call_states'][calls] = model_step.state.value
+            entry['calls'] = calls + 1
+            self._step_time += duration
+            if budget is not None and self._step_time > budget:
+                self._step_exceeded = True
+
+    def run(self, mf6, show_report=False):
+        """
+        Run the model loop of `mf6` with all controllers.
+
+        Returns the report after the simulation is finalized.
+        """
+        for model_step in mf6.model_loop():
+            self(model_step)
+        # Count the last time step.
+        self._start_step(None)
+        report = self.report()
+        if show_report:
+            print(report)
+        return report
+
+    def report(self, by_state=False):
+        """
+        Calls, skips, and time percentiles in seconds per controller.
+
+        `by_state` - one row per controller and state
+        """
+        rows = {}
+        for name, entry in self.controllers.items():
+            durations = entry['durations'][:entry['calls']]
+            if not by_state:
+                rows[name] = self._report_row(entry, durations)
+                continue
+            states = entry['call_states'][:entry['calls']]
+            for value in np.unique(states):
+                rows[(name, States(value).name)] = self._report_row(
+                    entry, durations[states == value]
+                )
+        report = pd.DataFrame.from_dict(rows, orient='index')
+        report.attrs['budget_exceeded'] = self.budget_exceeded
+        return report
+
+    @staticmethod
+    def _report_row(entry, durations):
+        row = {
+            'essential': entry['essential'],
+            'calls': durations.size,
+            'skipped': entry['skipped'],
+            'total': durations.sum(),
+            'mean': np.nan,
+            'max': np.nan,
+        }
+        for percentile in PERCENTILES:
+            row[f'p{percentile}'] = np.nan
+        if durations.size:
+            row['mean'] = durations.mean()
+            row['max'] = durations.max()
+            values = np.percentile(durations, PERCENTILES)
+            for percentile, value in zip(PERCENTILES, values):
+                row[f'p{percentile}'] = value
+        return row
+
+
+def snapshot_x(model_step):
+    """Copies of X of all models of the simulation group and the time."""
+    sim_grp = model_step.simulation_group
+    mf6 = sim_grp.mf6
+    return {
+        'time': mf6.get_current_time(),
+        'kper': sim_grp.kper,
+        'kstp': sim_grp.kstp,
+        'x': {
+            name.upper(): mf6.get_value(f'{name.upper()}/X')
+            for name in sim_grp.model_names
+        },
+    }
+
+
+class LaggedController:
+    """
+    Compute a controller in a worker thread, lagged by one time step.
+
+    `compute` - function with a snapshot as argument that returns the
+                result, called in the worker thread; it must not access
+                MF6 memory
+    `apply` - function with a `ModelStep` and a result as arguments that
+              changes MF6 memory, e.g. sets well rates
+    `snapshot` - function with a `ModelStep` as argument that copies the
+                 state needed by `compute`, defaults to `snapshot_x`
+    `model` - name of the model whose solution group triggers the
+              controller, defaults to the first model seen
+    `max_workers` - number of worker threads
+
+    Lag semantics:
+
+    * at the end of time step n, `snapshot` copies the state and
+      `compute` is started in the worker thread
+    * MF6 solves time step n + 1 in the meantime; the calls into the
+      MF6 shared library release the GIL, so both run in parallel
+    * at the start of time step n + 2, the result of step n is passed to
+      `apply`; if `compute` is not finished, the main thread waits
+
+    Therefore, each result is applied exactly two steps after its
+    snapshot, independent of thread timing, and runs are reproducible.
+    Time steps 0 and 1 run without control. Compared with calling the
+    controller at the start of each step, the controller reacts one time
+    step later. This is acceptable if the state changes slowly relative
+    to the time step length.
+
+    An instance is a controller, i.e. it is called with a `ModelStep`.
+    Call `close()` or use it as context manager to stop the threads.
+    """
+
+    def __init__(
+            self, compute, apply, snapshot=snapshot_x, model=None,
+            max_workers=1):
+        self.compute = compute
+        self.apply = apply
+        self.snapshot = snapshot
+        self.model = None if model is None else model.upper()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='pymf6-lagged'
+        )
+        # (step of the snapshot, future)
+        self.pending = deque()
+        self.applied = 0
+        self.wait_time = 0.0
+        self._step_count = -1
+
+    def _step(self, model_step):
+        stats = getattr(model_step, 'stats', None)
+        if stats is not None:
+            return stats.step
+        if model_step.state == States.timestep_start:
+            self._step_count += 1
+        return self._step_count
+
+    def __call__(self, model_step):
+        state = model_step.state
+        if state not in (States.timestep_start, States.timestep_end):
+            return
+        model_names = [
+            name.upper() for name in model_step.simulation_group.model_names
+        ]
+        if self.model is None:
+            self.model = model_names[0]
+        if self.model not in model_names:
+            return
+        step = self._step(model_step)
+        if state == States.timestep_end:
+            snapshot = self.snapshot(model_step)
+            self.pending.append(
+                (step, self.executor.submit(self.compute, snapshot))
+            )
+            return
+        while self.pending and self.pending[0][0] <= step - 2:
+            _, future = self.pending.popleft()
+            start = perf_counter()
+            result = future.result()
+            self.wait_time += perf_counter() - start
+            self.apply(model_step, result)
+            self.applied += 1
+
+    def close(self):
+        """Discard pending results and stop the worker threads."""
+        for _, future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
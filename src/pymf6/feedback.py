@@ -0,0 +1,244 @@
+"""Vectorised feedback controllers for wells.
+
+The controllers set the rates of many wells so that heads or
+concentrations in observed cells reach setpoints. All state is kept in
+NumPy arrays with one value per well, i.e. one instance controls
+thousands of wells.
+
+* `PIDController` - proportional, integral, and derivative terms
+* `PIController` - `PIDController` without derivative term
+* `DeadbandController` - change rates by fixed steps only if the error is
+  outside of a deadband
+
+The error is `setpoint - measured`. With positive gains, the rate
+increases if the measured value is below the setpoint. This reduces
+pumping of extraction wells (negative rates) if the head is too low and
+reduces injection if the head is too high. For concentration targets,
+use negative gains to pump more if the concentration is too high.
+
+All controllers support output limits, e.g. `(-500, 0)` to keep a well
+extracting, and a rate limit, i.e. a maximum change of the rate per time
+unit. PID controllers stop integrating while the output is limited
+(anti-windup).
+
+Controllers are called with a `ModelStep` at `timestep_start` (default)
+or `iteration_start`. If called for several iterations of one time step,
+only the last call of the time step is used for the integral and the
+rate limit applies to the change within the whole time step.
+
+Usage example:
+
+>>> pid = PIDController(
+...     model='gwf', package='wel_0', wells=[(0, 4, 4)], setpoint=0.5,
+...     kp=20.0, ki=2.0, output_limits=(-50, 0),
+... )
+>>> for model_step in mf6.model_loop():
+...     pid(model_step)
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .api import States
+from .rules import WellGroup
+
+
+class FeedbackController(WellGroup, ABC):
+    """
+    Base class of the feedback controllers.
+
+    `model` - name of the model with the well package
+    `package` - name of the well package, e.g. `'wel_0'`
+    `wells` - cell ids or zero-based user node numbers of the wells
+    `setpoint` - scalar or one value per well
+    `observed` - cells to measure, defaults to `wells`
+    `observed_model` - model to measure, e.g. a transport model,
+                       defaults to `model`
+    `output_limits` - lower and upper limits of the rates, scalars or
+                      arrays
+    `rate_limit` - maximum absolute change of the rates per time unit,
+                   `None` for no limit
+    `state` - `States.timestep_start` or `States.iteration_start`
+    `stress_periods` - zero-based stress periods to control,
+                       defaults to all
+    `column` - column of `BOUND` with the rates
+    """
+
+    def __init__(
+            self,
+            model,
+            package,
+            wells,
+            setpoint,
+            observed=None,
+            observed_model=None,
+            output_limits=(-np.inf, np.inf),
+            rate_limit=None,
+            state=States.timestep_start,
+            stress_periods=None,
+            column=0):
+        if state not in (States.timestep_start, States.iteration_start):
+            raise ValueError(
+                'Controllers run at `timestep_start` or `iteration_start`.'
+            )
+        super().__init__(
+            model, package, wells, observed=observed,
+            observed_model=observed_model, stress_periods=stress_periods,
+            column=column,
+        )
+        self.setpoint = np.broadcast_to(
+            np.asarray(setpoint, dtype=np.float64), self.nwells
+        ).copy()
+        self.lower = np.broadcast_to(
+            np.asarray(output_limits[0], dtype=np.float64), self.nwells
+        )
+        self.upper = np.broadcast_to(
+            np.asarray(output_limits[1], dtype=np.float64), self.nwells
+        )
+        self.rate_limit = rate_limit
+        self.state = state
+        self.time = None
+        # rates at the end of the previous time step
+        self.output = None
+        self.error = np.zeros(self.nwells)
+        self.measured = np.full(self.nwells, np.nan)
+        self.calls = 0
+
+    def _new_step(self, rates):
+        """Store the state of the finished time step."""
+
+    @abstractmethod
+    def _compute(self, measured, error, dt, rates):
+        """New rates, implemented by subclasses."""
+
+    def __call__(self, model_step):
+        if model_step.state != self.state:
+            return
+        if not self.bind(model_step):
+            return
+        sim_grp = model_step.simulation_group
+        time = sim_grp.mf6.get_current_time()
+        if time != self.time:
+            rates = self.binding.get()
+            if self.output is not None:
+                # Keep the last output for wells missing in the package.
+                rates = np.where(np.isnan(rates), self.output, rates)
+            self.output = rates
+            self._new_step(rates)
+            self.time = time
+        dt = sim_grp.delt
+        measured = self.x[self.observed]
+        error = self.setpoint - measured
+        rates = self._compute(measured, error, dt, self.output)
+        if self.rate_limit is not None:
+            max_change = self.rate_limit * dt
+            rates = np.clip(
+                rates, self.output - max_change, self.output + max_change
+            )
+        rates = np.clip(rates, self.lower, self.upper)
+        self.measured = measured
+        self.error = error
+        self.calls += 1
+        self.binding.set(rates)
+        return rates
+
+
+class PIDController(FeedbackController):
+    """
+    Vectorised PID controller.
+
+    `kp`, `ki`, `kd` - gains, scalars or one value per well
+    `deadband` - errors with an absolute value below are treated as zero
+
+    The derivative term uses the change of the measured value, so changes
+    of the setpoint do not cause jumps. The output is the rate at the
+    first call plus the sum of all terms. See `FeedbackController` for the
+    other arguments.
+    """
+
+    def __init__(self, model, package, wells, setpoint, kp, ki=0.0, kd=0.0,
+                 deadband=0.0, **kwargs):
+        super().__init__(model, package, wells, setpoint, **kwargs)
+        self.kp = np.asarray(kp, dtype=np.float64)
+        self.ki = np.asarray(ki, dtype=np.float64)
+        self.kd = np.asarray(kd, dtype=np.float64)
+        self.deadband = deadband
+        self.bias = None
+        self.integral = np.zeros(self.nwells)
+        self._step_integral = np.zeros(self.nwells)
+        self._step_measured = np.full(self.nwells, np.nan)
+        self._last_measured = np.full(self.nwells, np.nan)
+
+    def _new_step(self, rates):
+        if self.bias is None:
+            self.bias = np.where(np.isnan(rates), 0.0, rates)
+            return
+        self.integral = self._step_integral.copy()
+        self._last_measured = self._step_measured.copy()
+
+    def _compute(self, measured, error, dt, rates):
+        if self.deadband:
+            error = np.sign(error) * np.maximum(
+                np.abs(error) - self.deadband, 0.0
+            )
+        integral = self.integral + error * dt
+        derivative = np.where(
+            np.isnan(self._last_measured),
+            0.0,
+            -(measured - self._last_measured) / dt,
+        )
+        output = (
+            self.bias + self.kp * error + self.ki * integral
+            + self.kd * derivative
+        )
+        # Anti-windup: do not integrate while the output is limited and
+        # the integral term drives it further beyond the limit. The sign
+        # of `ki` matters, negative gains are used for concentrations.
+        drive = self.ki * error
+        windup = ((output > self.upper) & (drive > 0)) | (
+            (output < self.lower) & (drive < 0)
+        )
+        self._step_integral = np.where(windup, self.integral, integral)
+        self._step_measured = measured.copy()
+        return output
+
+
+class PIController(PIDController):
+    """
+    Vectorised PI controller.
+
+    See `PIDController` for the arguments.
+    """
+
+    def __init__(self, model, package, wells, setpoint, kp, ki=0.0,
+                 deadband=0.0, **kwargs):
+        super().__init__(
+            model, package, wells, setpoint, kp, ki=ki, kd=0.0,
+            deadband=deadband, **kwargs
+        )
+
+
+class DeadbandController(FeedbackController):
+    """
+    Change rates by fixed steps if the error is outside a deadband.
+
+    `deadband` - no change while the absolute error is below this value
+    `step` - change of the rates per time step, in the direction of the
+             error, scalar or one value per well
+    `relative` - `step` is a fraction of the current absolute rate
+
+    See `FeedbackController` for the other arguments.
+    """
+
+    def __init__(self, model, package, wells, setpoint, deadband, step,
+                 relative=False, **kwargs):
+        super().__init__(model, package, wells, setpoint, **kwargs)
+        self.deadband = deadband
+        self.step = np.asarray(step, dtype=np.float64)
+        self.relative = relative
+
+    def _compute(self, measured, error, dt, rates):
+        step = self.step * np.abs(rates) if self.relative else self.step
+        direction = np.where(np.abs(error) > self.deadband, np.sign(error), 0)
+        return rates + direction * step
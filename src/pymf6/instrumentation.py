@@ -0,0 +1,185 @@
+"""Convergence and timing data of a simulation run.
+
+`Simulator` records for each time step and each solution:
+
+* the number of outer iterations
+* whether the solution converged
+
+and, only with `timing=True` or a `run_log`:
+
+* the wall time spent in `solve`
+* the wall time spent in user code between the yields of the loop
+* the maximum change of X during the time step, i.e. the head change
+  for flow models
+
+The values are stored in preallocated NumPy arrays with one row per time
+step and one column per solution. The number of rows is the total number
+of time steps in TDIS. It grows if there are more steps, e.g. with ATS.
+
+Usage example:
+
+>>> mf6 = MF6('path/to/sim', timing=True)
+>>> for model_step in mf6.model_loop():
+...     if model_step.state == States.timestep_end:
+...         print(model_step.iterations, model_step.solve_time)
+>>> mf6.solve_stats.to_dataframe()
+"""
+
+import numpy as np
+import pandas as pd
+
+# Arrays with one column per solution.
+SOLUTION_FIELDS = (
+    'iterations', 'converged', 'solve_time', 'user_time', 'max_change'
+)
+# Fill values for steps or solutions without data.
+FILL_VALUES = {
+    'kper': -1,
+    'kstp': -1,
+    'totim': np.nan,
+    'iterations': -1,
+    'converged': False,
+    'solve_time': 0.0,
+    'user_time': 0.0,
+    'max_change': np.nan,
+}
+DTYPES = {
+    'kper': np.int32,
+    'kstp': np.int32,
+    'totim': np.float64,
+    'iterations': np.int32,
+    'converged': bool,
+    'solve_time': np.float64,
+    'user_time': np.float64,
+    'max_change': np.float64,
+}
+
+
+class SolveStats:
+    """
+    Per time step and per solution convergence and timing data.
+
+    `nsteps` - expected number of time steps
+    `nsol` - number of solutions
+
+    `step` is the index of the current time step. Solutions are stored in
+    the order of their ids, i.e. solution id 1 is in column 0.
+    """
+
+    def __init__(self, nsteps, nsol):
+        self.nsol = nsol
+        self.step = -1
+        self._pointers = {}
+        capacity = max(int(nsteps), 1)
+        self.kper = self._new_array('kper', capacity)
+        self.kstp = self._new_array('kstp', capacity)
+        self.totim = self._new_array('totim', capacity)
+        self.iterations = self._new_array('iterations', capacity)
+        self.converged = self._new_array('converged', capacity)
+        self.solve_time = self._new_array('solve_time', capacity)
+        self.user_time = self._new_array('user_time', capacity)
+        self.max_change = self._new_array('max_change', capacity)
+
+    def _new_array(self, name, capacity):
+        """Array of field `name` filled with its fill value."""
+        shape = (capacity, self.nsol) if name in SOLUTION_FIELDS else capacity
+        return np.full(shape, FILL_VALUES[name], dtype=DTYPES[name])
+
+    @classmethod
+    def from_mf6(cls, mf6, nsol):
+        """Size the arrays with the number of time steps in TDIS."""
+        nstp = mf6.get_value_ptr(mf6.get_var_address('NSTP', 'TDIS'))
+        return cls(nstp.sum(), nsol)
+
+    @property
+    def capacity(self):
+        """Number of allocated time steps."""
+        return len(self.kper)
+
+    @property
+    def nsteps(self):
+        """Number of recorded time steps."""
+        return self.step + 1
+
+    def _grow(self):
+        capacity = 2 * self.capacity
+        for name in DTYPES:
+            old = getattr(self, name)
+            new = self._new_array(name, capacity)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def start_step(self, kper, kstp, totim):
+        """Start a new time step and return its index."""
+        self.step += 1
+        if self.step >= self.capacity:
+            self._grow()
+        self.kper[self.step] = kper
+        self.kstp[self.step] = kstp
+        self.totim[self.step] = totim
+        return self.step
+
+    def _get_pointers(self, mf6, name):
+        pointers = self._pointers.get(name)
+        if pointers is None:
+            pointers = (
+                mf6.get_value_ptr(mf6.get_var_address('X', name.upper())),
+                mf6.get_value_ptr(mf6.get_var_address('XOLD', name.upper())),
+            )
+            self._pointers[name] = pointers
+        return pointers
+
+    def record_change(self, mf6, model_names, sol_index):
+        """Store the maximum change of X of the models in one solution."""
+        max_change = self.max_change[self.step, sol_index]
+        for name in model_names:
+            x, xold = self._get_pointers(mf6, name)
+            if not x.size:
+                continue
+            change = np.abs(x - xold).max()
+            if not max_change >= change:
+                max_change = change
+        self.max_change[self.step, sol_index] = max_change
+
+    def current(self):
+        """Values of the current time step as dict of arrays by solution."""
+        return {
+            name: getattr(self, name)[self.step] for name in SOLUTION_FIELDS
+        }
+
+    def to_dataframe(self):
+        """
+        All recorded time steps as a `DataFrame`.
+
+        One row per time step and solution. Stress periods and time steps
+        are zero-based.
+        """
+        nsteps = self.nsteps
+        data = {
+            'step': np.repeat(np.arange(nsteps), self.nsol),
+            'solution': np.tile(np.arange(1, self.nsol + 1), nsteps),
+        }
+        for name in ['kper', 'kstp', 'totim']:
+            data[name] = np.repeat(getattr(self, name)[:nsteps], self.nsol)
+        for name in SOLUTION_FIELDS:
+            data[name] = getattr(self, name)[:nsteps].ravel()
+        return pd.DataFrame(data)
+
+    def summary(self):
+        """
+        Summary by stress period and solution.
+
+        Sums of iterations and times, number of time steps that did not
+        converge, and the largest change of X.
+        """
+        df = self.to_dataframe()
+        df['not_converged'] = ~df['converged'] & (df['iterations'] >= 0)
+        return df.groupby(['kper', 'solution']).agg(
+            steps=('step', 'count'),
+            iterations=('iterations', 'sum'),
+            max_iterations=('iterations', 'max'),
+            not_converged=('not_converged', 'sum'),
+            solve_time=('solve_time', 'sum'),
+            user_time=('user_time', 'sum'),
+            max_change=('max_change', 'max'),
+        )
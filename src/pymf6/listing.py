@@ -0,0 +1,262 @@
+"""Incremental parser for MF6 listing files.
+
+`ListingFile` reads only the bytes appended since the last call of
+`update()`. Incomplete lines at the end of the file are kept until the
+rest is written. Therefore, the listing files can be followed while the
+simulation runs, independent of their size.
+
+Extracted data:
+
+* budget tables of the model listing file, e.g. `VOLUME BUDGET FOR ENTIRE
+  MODEL` and `MASS BUDGET FOR ENTIRE MODEL`, with cumulative values and
+  rates of all terms, and the percent discrepancy
+* the solver summary of the simulation listing file `mfsim.lst`, i.e.
+  calls to the numerical solution and total iterations per time step
+* the elapsed run time at the end of `mfsim.lst`
+
+Stress periods and time steps are zero-based.
+
+Usage example:
+
+>>> lst = ListingFile('path/to/sim/gwf.lst')
+>>> for model_step in mf6.model_loop():
+...     if model_step.state == States.timestep_end:
+...         lst.update()
+>>> lst.budget_frame()
+"""
+
+from pathlib import Path
+import re
+
+import numpy as np
+import pandas as pd
+
+# Read new bytes in blocks of this size.
+CHUNK_SIZE = 16 * 1024**2
+BUDGET_HEADER = re.compile(
+    r'(\w+) BUDGET FOR ENTIRE MODEL AT END OF TIME STEP\s+(\d+),'
+    r'\s+STRESS PERIOD\s+(\d+)'
+)
+SOLVER_CALLS = re.compile(
+    r'(\d+) CALLS TO NUMERICAL SOLUTION IN TIME STEP\s+(\d+)'
+    r'\s+STRESS PERIOD\s+(\d+)'
+)
+TOTAL_ITERATIONS = re.compile(r'(\d+) TOTAL ITERATIONS')
+ELAPSED_PART = re.compile(r'([\d.]+)\s+(Days|Hours|Minutes|Seconds)')
+SECONDS = {'Days': 86400, 'Hours': 3600, 'Minutes': 60, 'Seconds': 1}
+
+
+def _to_float(text):
+    """Convert a number of the listing file, overflow (`***`) is NaN."""
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+class GrowableArray:
+    """
+    Two-dimensional array that grows in rows and columns.
+
+    `ncol` - initial number of columns
+    `dtype` - data type
+    `fill` - value of rows and columns without data
+    """
+
+    def __init__(self, ncol=1, dtype=np.float64, fill=np.nan, capacity=64):
+        self.fill = fill
+        self.nrows = 0
+        self._data = np.full((capacity, ncol), fill, dtype=dtype)
+
+    @property
+    def ncol(self):
+        """Number of columns."""
+        return self._data.shape[1]
+
+    def _resize(self, nrows, ncol):
+        data = np.full((nrows, ncol), self.fill, dtype=self._data.dtype)
+        old_rows, old_ncol = self._data.shape
+        data[:old_rows, :old_ncol] = self._data
+        self._data = data
+
+    def add_columns(self, ncol):
+        """Make sure there are at least `ncol` columns."""
+        if ncol > self.ncol:
+            self._resize(len(self._data), max(ncol, 2 * self.ncol))
+
+    def new_row(self):
+        """Add a row filled with `fill` and return its index."""
+        if self.nrows == len(self._data):
+            self._resize(2 * len(self._data), self.ncol)
+        self.nrows += 1
+        return self.nrows - 1
+
+    def __setitem__(self, index, value):
+        self._data[index] = value
+
+    @property
+    def values(self):
+        """Array with all rows and used columns."""
+        return self._data[:self.nrows]
+
+
+class ListingFile:
+    """
+    Follow a MF6 listing file.
+
+    `path` - path to the model listing file or `mfsim.lst`
+    `chunk_size` - maximum bytes read at once
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self._partial = b''
+        # budget of each time step
+        self.budget_kind = None
+        self.terms = []
+        self._term_index = {}
+        self.budget_steps = GrowableArray(2, dtype=np.int32, fill=-1)
+        self.cumulative = GrowableArray(8)
+        self.rates = GrowableArray(8)
+        # cumulative and rate
+        self.discrepancy = GrowableArray(2)
+        self._budget_row = None
+        self._direction = None
+        # solver summary of each time step
+        self.solver_steps = GrowableArray(2, dtype=np.int32, fill=-1)
+        self.solver = GrowableArray(2, dtype=np.int64, fill=-1)
+        self.elapsed_time = None
+
+    def update(self):
+        """Parse new lines and return their number."""
+        if not self.path.exists():
+            return 0
+        size = self.path.stat().st_size
+        if size < self.offset:
+            raise ValueError(
+                f'{self.path} is shorter than the last read position. '
+                'Create a new `ListingFile` for a new run.'
+            )
+        count = 0
+        with open(self.path, 'rb') as fobj:
+            fobj.seek(self.offset)
+            while chunk := fobj.read(self.chunk_size):
+                self.offset += len(chunk)
+                lines = (self._partial + chunk).split(b'\n')
+                self._partial = lines.pop()
+                for line in lines:
+                    self._parse_line(line.decode('ascii', errors='replace'))
+                count += len(lines)
+        return count
+
+    def _term_column(self, name):
+        column = self._term_index.get(name)
+        if column is None:
+            column = len(self.terms)
+            self.terms.append(name)
+            self._term_index[name] = column
+            self.cumulative.add_columns(column + 1)
+            self.rates.add_columns(column + 1)
+        return column
+
+    def _parse_budget_line(self, line):
+        stripped = line.strip()
+        if stripped.startswith(('IN:', 'OUT:')):
+            self._direction = stripped.split(':')[0]
+            return
+        if '=' not in line:
+            return
+        parts = line.split('=')
+        if len(parts) != 3:
+            return
+        name = parts[0].strip()
+        cumulative = parts[1].split()
+        rate = parts[2].split()
+        if not cumulative or not rate:
+            return
+        row = self._budget_row
+        if name == 'PERCENT DISCREPANCY':
+            self.discrepancy[row] = (
+                _to_float(cumulative[0]), _to_float(rate[0])
+            )
+            self._budget_row = None
+            return
+        if name.startswith('TOTAL') or name == 'IN - OUT':
+            key = name
+        else:
+            package = rate[1] if len(rate) > 1 else ''
+            key = f'{self._direction}:{name}:{package}'
+        column = self._term_column(key)
+        self.cumulative[row, column] = _to_float(cumulative[0])
+        self.rates[row, column] = _to_float(rate[0])
+
+    def _parse_line(self, line):
+        if self._budget_row is not None and 'BUDGET FOR' not in line:
+            self._parse_budget_line(line)
+            return
+        if 'BUDGET FOR ENTIRE MODEL' in line:
+            match = BUDGET_HEADER.search(line)
+            if match:
+                kind, kstp, kper = match.groups()
+                self.budget_kind = kind
+                row = self.budget_steps.new_row()
+                self.budget_steps[row] = (int(kper) - 1, int(kstp) - 1)
+                self.cumulative.new_row()
+                self.rates.new_row()
+                self.discrepancy.new_row()
+                self._budget_row = row
+                self._direction = None
+        elif 'CALLS TO NUMERICAL SOLUTION' in line:
+            match = SOLVER_CALLS.search(line)
+            if match:
+                calls, kstp, kper = match.groups()
+                row = self.solver_steps.new_row()
+                self.solver_steps[row] = (int(kper) - 1, int(kstp) - 1)
+                self.solver.new_row()
+                self.solver[row, 0] = int(calls)
+        elif 'TOTAL ITERATIONS' in line:
+            match = TOTAL_ITERATIONS.search(line)
+            if match and self.solver.nrows:
+                self.solver[self.solver.nrows - 1, 1] = int(match.group(1))
+        elif 'Elapsed run time' in line:
+            self.elapsed_time = sum(
+                float(value) * SECONDS[unit]
+                for value, unit in ELAPSED_PART.findall(line)
+            )
+
+    def budget_frame(self, kind='rate'):
+        """
+        Budget terms of all time steps as `DataFrame`.
+
+        `kind` - `'rate'` or `'cumulative'`
+
+        Columns are `direction:term:package` and the totals.
+        """
+        kinds = {'rate': self.rates, 'cumulative': self.cumulative}
+        if kind not in kinds:
+            raise ValueError(f'Unknown kind {kind}. Use one of {list(kinds)}.')
+        values = kinds[kind].values[:, :len(self.terms)]
+        steps = self.budget_steps.values
+        df = pd.DataFrame(
+            values,
+            columns=self.terms,
+            index=pd.MultiIndex.from_arrays(
+                [steps[:, 0], steps[:, 1]], names=['kper', 'kstp']
+            ),
+        )
+        column = 0 if kind == 'cumulative' else 1
+        df['PERCENT DISCREPANCY'] = self.discrepancy.values[:, column]
+        return df
+
+    def solver_frame(self):
+        """Calls to the numerical solution and total iterations per step."""
+        steps = self.solver_steps.values
+        return pd.DataFrame(
+            self.solver.values,
+            columns=['calls', 'total_iterations'],
+            index=pd.MultiIndex.from_arrays(
+                [steps[:, 0], steps[:, 1]], names=['kper', 'kstp']
+            ),
+        )
@@ -3,26 +3,88 @@
 
 import sys
 
+from . import __modflow_version__
+from .api import States
 from .mf6 import MF6
 from .tools.info import show_info
 
 
-def run_model(sim_path):
-    """Run one model without modifications."""
+def run_model(
+        sim_path,
+        ram_workspace=False,
+        ram_outputs=None,
+        run_cache=None,
+        fingerprint='',
+        run_log=None):
+    """Run one model without modifications.
+
+    `ram_workspace` and `ram_outputs` are passed to `MF6`.
+    `run_cache` - `RunCache` instance, a stored run with the same inputs,
+                  MF6 version, and `fingerprint` is used instead of
+                  running the model
+    `run_log` - `RunLog` instance for events of the run and its time steps
+
+    With `run_cache`, returns the final state, i.e. a dict with X of each
+    model at the end of the simulation, for cached and new runs.
+    Without `run_cache`, the final state is not collected and the dict is
+    empty.
+    """
     text = f'running {sim_path}'
     line = '=' * len(text)
     print(line)
     print(text)
     print(line)
+    key = None
+    if run_cache is not None:
+        key = run_cache.make_key(sim_path, __modflow_version__, fingerprint)
+        final_state = run_cache.get(key, sim_path)
+        if final_state is not None:
+            if run_log is not None:
+                run_log.event('run_cached', sim_path=str(sim_path), key=key)
+            print(f'CACHED {sim_path}')
+            print(line)
+            return final_state
     try:
-        mf6 = MF6(sim_path=sim_path)
-        for _ in mf6.model_loop():
-            pass
+        mf6 = MF6(
+            sim_path=sim_path,
+            ram_workspace=ram_workspace,
+            ram_outputs=ram_outputs,
+            run_log=run_log,
+        )
+        end_time = mf6.get_end_time()
+        final_state = {}
+        for model_step in mf6.model_loop():
+            if (
+                key is not None
+                and model_step.state == States.timestep_end
+                and mf6.get_current_time() >= end_time
+            ):
+                for name in mf6.simulation.model_names:
+                    final_state[name] = mf6.get_value(f'{name.upper()}/X')
+        if mf6.ram_workspace is not None and mf6.ram_workspace.active:
+            report = mf6.ram_workspace.join()
+            if run_log is not None:
+                run_log.event('ram_workspace', **report)
+            print(
+                f'copied {report["files_copied"]} files '
+                f'({report["bytes_copied"]} bytes) from RAM workspace, '
+                f'saved writing {report["bytes_saved"]} bytes'
+            )
+        if key is not None:
+            run_cache.put(key, sim_path, final_state)
+        if run_log is not None:
+            run_log.event('run_end', sim_path=str(sim_path), status='good')
         print(f'GOOD {sim_path}')
     except Exception as err:
+        if run_log is not None:
+            run_log.event(
+                'run_end', sim_path=str(sim_path), status='bad',
+                error=repr(err),
+            )
         print(f'BAD {sim_path}')
         raise err
     print(line)
+    return final_state
 
 
 def main():
@@ -3,18 +3,26 @@
 from contextlib import redirect_stdout
 import json
 from io import StringIO
+import os
 from pathlib import Path
+import sys
 from textwrap import dedent
 from types import MethodType
 from warnings import warn
 
+import numpy as np
 import pandas as pd
+try:
+    import psutil
+except ImportError:
+    psutil = None
 from xmipy import XmiWrapper
 from xmipy.errors import InputError, XMIError
 from xmipy.utils import cd
 
 from .api import create_mutable_bc, Simulator, States
 from .datastructures import Simulation
+from .workspace import RamWorkspace
 from .tools.info import (
     get_info_data,
     show_info,
@@ -24,6 +32,81 @@ from .tools.info import (
 )
 
 
+# Parameters that can be set with `MF6.set_parameters`.
+# name: (package, name in input variable schema)
+PARAMETERS = {
+    'K11': ('NPF', 'k'),
+    'K22': ('NPF', 'k22'),
+    'K33': ('NPF', 'k33'),
+    'SS': ('STO', 'ss'),
+    'SY': ('STO', 'sy'),
+    'STRT': ('IC', 'strt'),
+}
+# Parameters that must be larger than zero.
+POSITIVE_PARAMETERS = ('K11', 'K22', 'K33')
+# Parameters that must not be negative, e.g. CSUB needs SS of zero.
+NON_NEGATIVE_PARAMETERS = ('SS', 'SY')
+# NPF flags that K22 and K33 were read and that they are ratios of K11.
+K_FLAGS = {'K22': ('IK22', 'IK22OVERK'), 'K33': ('IK33', 'IK33OVERK')}
+SCHEMA_DTYPES = {
+    'double precision': np.float64,
+    'integer': np.int32,
+}
+
+
+# Number of arrays marked as largest in `MF6.memory_report`.
+LARGEST_ARRAYS = 10
+
+
+def get_rss():
+    """
+    Resident set size of this process in bytes.
+
+    Uses `psutil` if installed. Otherwise, `/proc/self/statm` on Linux or
+    the peak RSS from `resource` are used. Returns `None` if none of these
+    is available.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', encoding='ascii') as fobj:
+            pages = int(fobj.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def read_input_var_schema(model_type, package, version):
+    """Read the input variable schema of a package.
+
+    Uses the schema of `version` or of the closest older version.
+    If there is none, the oldest available schema is used.
+    """
+    base_path = (
+        Path(__file__).parent / 'resources' / 'mf6_var_names' / 'input_vars'
+    )
+
+    def as_tuple(version):
+        return tuple(int(part) for part in version.split('.')[:3])
+
+    versions = sorted(
+        (path.name for path in base_path.iterdir()), key=as_tuple
+    )
+    current = as_tuple(version.split('.dev')[0])
+    older = [entry for entry in versions if as_tuple(entry) <= current]
+    selected = older[-1] if older else versions[0]
+    path = base_path / selected / model_type / f'{package.lower()}.json'
+    with open(path, encoding='utf-8') as fobj:
+        return json.load(fobj)
+
+
 class SimValues:
     def __init__(self, mf6):
         self.mf6 = mf6
@@ -38,6 +121,28 @@ class MF6:
 
     `advance_first_step = True` progresses to the first model step with
     model time > 0. This is needed to access any internal values of BCs.
+
+    `ram_workspace = True` runs the simulation in a copy in `/dev/shm`,
+    a path runs it in a copy in this RAM-backed directory.
+    After the run, the files matching the glob patterns `ram_outputs`,
+    or all new and changed files if `None`, are copied back in a
+    background thread. See `pymf6.workspace.RamWorkspace`.
+
+    `predictor = 'linear'` or `'quadratic'` sets X at the start of each
+    time step by extrapolation of the last converged steps.
+    `predictor_summary()` shows the outer iterations with and without
+    prediction. Compare `solve_stats` with a run without predictor to
+    find the saved iterations. See `pymf6.predictor.Predictor`.
+
+    `tracer` records a timeline of the MF6 phases and the user code
+    between the steps. See `pymf6.tracing.Tracer`.
+
+    `run_log` writes an event for each time step as JSON line and
+    optionally a metrics file. See `pymf6.runlog.RunLog`.
+
+    `timing = True` records the solve time, the user time, and the maximum
+    change of X of each time step, see `solve_stats`. Iterations and
+    convergence are always recorded.
     """
 
     # pylint: disable=too-many-instance-attributes
@@ -58,6 +163,12 @@ class MF6:
         verbose=False,
         new_step_only=False,
         do_solution_loop=True,
+        ram_workspace=False,
+        ram_outputs=None,
+        predictor=None,
+        tracer=None,
+        run_log=None,
+        timing=False,
         _develop=False,
     ):
         def init_mf6(sim_path):
@@ -77,6 +188,10 @@ class MF6:
                     sim_path,
                     verbose=verbose,
                     do_solution_loop=do_solution_loop,
+                    predictor=predictor,
+                    tracer=tracer,
+                    run_log=run_log,
+                    timing=timing,
                     _develop=_develop,
                 )
                 # pylint: disable=protected-access
@@ -111,6 +226,7 @@ class MF6:
         self.ini_path = ini_data['ini_path']
         self.sim_values = SimValues(self)
         self.current_model_step = None
+        self._memory_meta = None
 
         if dll_path is None:
             self.dll_path = ini_data['dll_path']
@@ -120,13 +236,26 @@ class MF6:
         if not self.nam_file.exists():
             raise FileNotFoundError(self.nam_file)
         self.name = self.sim_path.name
-        with cd(self.sim_path):
-            init_mf6(str(self.nam_file.parent))
-            self.__class__.is_initialized = True
-            self.simulation = Simulation(
-                self._mf6, self.nam_file, self.mf6_docs
+        self.ram_workspace = None
+        if ram_workspace:
+            ram_dir = None if ram_workspace is True else ram_workspace
+            self.ram_workspace = RamWorkspace(
+                self.sim_path, ram_dir=ram_dir, outputs=ram_outputs
             )
-            self.vars = self._get_vars()
+            self.sim_path = self.ram_workspace.path
+            self.nam_file = self.sim_path / self.mfsim_nam
+        try:
+            with cd(self.sim_path):
+                init_mf6(str(self.nam_file.parent))
+                self.__class__.is_initialized = True
+                self.simulation = Simulation(
+                    self._mf6, self.nam_file, self.mf6_docs
+                )
+                self.vars = self._get_vars()
+        except BaseException:
+            if self.ram_workspace is not None:
+                self.ram_workspace.cleanup()
+            raise
         if use_modflow_api:
             self.sol_loop = self._simulator.loop()
         else:
@@ -163,6 +292,7 @@ class MF6:
                     simulation_group=simulation_group,
                     state=state,
                     do_solution_loop=self.do_solution_loop,
+                    stats=self._simulator.stats,
                 )
             else:
                 for step in self.steps:
@@ -171,16 +301,33 @@ class MF6:
 
     def model_loop(self):
         """Time step loop over all models."""
-        for simulation_group, state in self.sol_loop:
-            # mf6_model = sol_group.get_model()
-            # model_type = self._reverse_names[mf6_model.name.lower()]
-            self.current_model_step = ModelStep(
-                simulation_group=simulation_group,
-                state=state,
-                do_solution_loop=self.do_solution_loop,
-            )
-            yield (self.current_model_step)
-            # yield Model(mf6_model=mf6_model, state=state, type=model_type)
+        try:
+            for simulation_group, state in self.sol_loop:
+                # mf6_model = sol_group.get_model()
+                # model_type = self._reverse_names[mf6_model.name.lower()]
+                self.current_model_step = ModelStep(
+                    simulation_group=simulation_group,
+                    state=state,
+                    do_solution_loop=self.do_solution_loop,
+                    stats=self._simulator.stats,
+                )
+                yield (self.current_model_step)
+                # yield Model(
+                #    mf6_model=mf6_model, state=state, type=model_type)
+        finally:
+            # Also after exceptions and if the loop is abandoned.
+            self._finish_ram_workspace()
+
+    def _finish_ram_workspace(self):
+        """
+        Start copying outputs back from the RAM workspace.
+
+        `sim_path` points to the original directory again.
+        """
+        if self.ram_workspace is not None:
+            self.ram_workspace.finish()
+            self.sim_path = self.ram_workspace.sim_path
+            self.nam_file = self.sim_path / self.mfsim_nam
 
     def _repr_html_(self):
         """
@@ -199,6 +346,7 @@ class MF6:
     def finalize(self):
         """Finalize the model run."""
         self._mf6.finalize()
+        self._finish_ram_workspace()
 
     def do_time_step(self):
         """Do one time step."""
@@ -212,6 +360,10 @@ class MF6:
         """Return end model time step."""
         return self._mf6.get_end_time()
 
+    def get_value(self, address):
+        """Return a copy of an MF6 variable, e.g. `'GWF/X'`."""
+        return self._mf6.get_value(address)
+
     def update(self):
         """Update MF6 variables."""
         return self._mf6.update()
@@ -304,6 +456,228 @@ class MF6:
         tag = self._mf6.get_var_address('SIMVALS', self.name, val_name.upper())
         return self._mf6.get_value_ptr(tag)
 
+    def _get_memory_meta(self):
+        """Address, type, shape, and size of all memory manager variables."""
+        records = []
+        with redirect_stdout(StringIO()):
+            for address in self._mf6.get_input_var_names():
+                try:
+                    nbytes = self._mf6.get_var_nbytes(address)
+                    var_type = self._mf6.get_var_type(address)
+                    shape = tuple(self._mf6.get_var_shape(address))
+                except (InputError, XMIError):
+                    continue
+                component, *subcomponent, variable = address.split('/')
+                records.append((
+                    address,
+                    component,
+                    subcomponent[0] if subcomponent else '',
+                    variable,
+                    var_type.split('(')[0].strip(),
+                    shape,
+                    nbytes,
+                ))
+        return pd.DataFrame.from_records(
+            records,
+            columns=[
+                'address', 'model', 'package', 'variable', 'type', 'shape',
+                'nbytes',
+            ],
+        )
+
+    def memory_report(self, level='variable', refresh=False):
+        """
+        Memory used by the variables of the MF6 memory manager.
+
+        `level` - aggregate bytes by `'model'`, `'package'`, or `'variable'`
+        `refresh` - query MF6 again, otherwise the variable sizes of the
+                    first call are reused
+
+        Returns a `DataFrame` sorted by size. With `level='variable'`,
+        the column `largest` marks the `LARGEST_ARRAYS` largest arrays.
+        The attributes `attrs` contain the total bytes, the RSS of the
+        process, and the fraction of the RSS used by MF6 variables.
+        """
+        levels = ['model', 'package', 'variable']
+        if level not in levels:
+            raise ValueError(f'Unknown level {level}. Use one of {levels}.')
+        meta = self._memory_meta
+        if meta is None or refresh:
+            meta = self._get_memory_meta()
+            self._memory_meta = meta
+        total = int(meta['nbytes'].sum())
+        if level == 'variable':
+            report = meta.set_index(levels).sort_values(
+                'nbytes', ascending=False
+            )
+            report['largest'] = np.arange(len(report)) < LARGEST_ARRAYS
+        else:
+            group_levels = levels[:levels.index(level) + 1]
+            report = meta.groupby(group_levels).agg(
+                nbytes=('nbytes', 'sum'), variables=('address', 'count')
+            ).sort_values('nbytes', ascending=False)
+        report['fraction'] = report['nbytes'] / total if total else np.nan
+        rss = get_rss()
+        report.attrs['total_bytes'] = total
+        report.attrs['rss'] = rss
+        report.attrs['rss_fraction'] = total / rss if rss else np.nan
+        return report
+
+    @property
+    def solve_stats(self):
+        """Convergence and timing data of all time steps so far."""
+        if self._simulator is None:
+            return None
+        return self._simulator.stats
+
+    def run_summary(self):
+        """Iterations and times by stress period and solution."""
+        if self._simulator is None:
+            return None
+        return self._simulator.stats.summary()
+
+    def predictor_summary(self):
+        """Outer iterations of steps with and without prediction."""
+        if self._simulator is None or self._simulator.predictor is None:
+            return {}
+        return self._simulator.predictor.summary()
+
+    def set_parameters(self, parameters, model_name=None):
+        """
+        Set model parameters in MF6 memory before the first time step.
+
+        This allows to run many parameter sets, e.g. members of an ensemble,
+        from one set of input files without writing new files.
+
+        `parameters` - dict with parameter names as keys, one of
+                       `K11`, `K22`, `K33`, `SS`, `SY`, `STRT`,
+                       and arrays as values. An array can have one value
+                       per active cell or one value per cell of the full
+                       grid. Scalars are used for all cells.
+        `model_name` - name of the flow model, only needed for simulations
+                       with more than one flow model
+
+        The values are checked against the input variable schema.
+        K must be larger than zero, SS and SY must not be negative.
+        The MF6 instance has to be created with `advance_first_step=False`.
+        Changed K values are flagged in the NPF package so that MF6
+        recalculates the conductances in the first time step.
+        If only K11 is given, K22 and K33 follow it as MF6 does when
+        reading the input: they are set to K11 if they were not given in
+        the input and scaled with K11 if they were given as ratios.
+
+        Usage example:
+
+        >>> mf6 = MF6('path/to/model', advance_first_step=False)
+        >>> mf6.set_parameters({'K11': k_field, 'SY': 0.15})
+        >>> for model_step in mf6.model_loop():
+        ...     pass
+        """
+        if self.get_current_time() > 0:
+            raise RuntimeError(
+                'Parameters can only be set before the first time step.\n'
+                'Create the MF6 instance with `advance_first_step=False`.'
+            )
+        flow_models = [
+            entry['modelname'] for entry in self.simulation.models_meta
+            if entry['modeltype'].lower() == 'gwf6'
+        ]
+        if model_name is None:
+            if len(flow_models) != 1:
+                raise ValueError(
+                    f'Found flow models {flow_models}. '
+                    'Please specify `model_name`.'
+                )
+            model_name = flow_models[0]
+        model_name = model_name.upper()
+        if model_name not in flow_models:
+            raise ValueError(
+                f'No flow model {model_name}. Available: {flow_models}'
+            )
+        unknown = set(parameters) - set(PARAMETERS)
+        if unknown:
+            raise ValueError(
+                f'Unknown parameters {sorted(unknown)}. '
+                f'Supported parameters are {list(PARAMETERS)}.'
+            )
+        mf6 = self._mf6
+        nodes = mf6.get_value_ptr(f'{model_name}/DIS/NODES')[0]
+        nodesuser = mf6.get_value_ptr(f'{model_name}/DIS/NODESUSER')[0]
+        new_values = {}
+        # Validate all values before changing anything in MF6 memory.
+        for name, value in parameters.items():
+            package, schema_name = PARAMETERS[name]
+            schema = read_input_var_schema('gwf', package, self.version)
+            dtype = SCHEMA_DTYPES[schema[schema_name]['type']]
+            address = f'{model_name}/{package}/{name}'
+            target = mf6.get_value_ptr(address)
+            if target.dtype != dtype:
+                raise TypeError(
+                    f'{address} has dtype {target.dtype} in MF6 memory '
+                    f'but the schema expects {dtype.__name__}.'
+                )
+            value = np.asarray(value)
+            if not np.can_cast(value.dtype, dtype, casting='same_kind'):
+                raise TypeError(
+                    f'Values for {name} with dtype {value.dtype} '
+                    f'cannot be converted to {dtype.__name__}.'
+                )
+            if value.size == 1:
+                value = np.full(nodes, value.item(), dtype=dtype)
+            elif value.size == nodesuser and nodes != nodesuser:
+                reduced = mf6.get_value_ptr(f'{model_name}/DIS/NODEREDUCED')
+                active = reduced > 0
+                value = value.ravel()[active]
+            elif value.size != nodes:
+                raise ValueError(
+                    f'{name} needs {nodes} values (active cells) or '
+                    f'{nodesuser} values (all cells), got {value.size}.'
+                )
+            value = value.ravel().astype(dtype)
+            if name in POSITIVE_PARAMETERS and not (value > 0).all():
+                raise ValueError(f'All values of {name} must be positive.')
+            if name in NON_NEGATIVE_PARAMETERS and not (value >= 0).all():
+                raise ValueError(
+                    f'All values of {name} must be zero or positive.'
+                )
+            new_values[name] = (address, target, value)
+        if 'K11' in new_values:
+            self._follow_k11(model_name, new_values)
+        for name, (address, target, value) in new_values.items():
+            target[:] = value
+            if name == 'STRT':
+                mf6.get_value_ptr(f'{model_name}/X')[:] = value
+        if {'K11', 'K22', 'K33'} & set(new_values):
+            mf6.get_value_ptr(f'{model_name}/NPF/KCHANGEPER')[:] = 1
+            mf6.get_value_ptr(f'{model_name}/NPF/KCHANGESTP')[:] = 1
+            mf6.get_value_ptr(f'{model_name}/NPF/NODEKCHANGE')[:] = 1
+
+    def _follow_k11(self, model_name, new_values):
+        """Add K22 and K33 to `new_values` if they depend on K11."""
+        mf6 = self._mf6
+        k11 = new_values['K11'][2]
+        old_k11 = mf6.get_value_ptr(f'{model_name}/NPF/K11')
+        for name, (read_flag, ratio_flag) in K_FLAGS.items():
+            if name in new_values:
+                continue
+            try:
+                read = mf6.get_value_ptr(f'{model_name}/NPF/{read_flag}')[0]
+                ratio = mf6.get_value_ptr(f'{model_name}/NPF/{ratio_flag}')[0]
+            except (InputError, XMIError) as err:
+                raise ValueError(
+                    f'Cannot find out if {name} was given in the input. '
+                    f'Please set {name} together with K11.'
+                ) from err
+            address = f'{model_name}/NPF/{name}'
+            target = mf6.get_value_ptr(address)
+            if not read:
+                value = k11.copy()
+            elif ratio:
+                value = target * (k11 / old_k11)
+            else:
+                continue
+            new_values[name] = (address, target, value)
+
     def goto_stress_period(self, stress_period=0):
         """Progress to beginning of stress period."""
         for sim, state in self.loop:
@@ -412,10 +786,41 @@ class Packages:
 class ModelStep:
     """Object holding information about the current step."""
 
-    def __init__(self, simulation_group, state, do_solution_loop):
+    def __init__(self, simulation_group, state, do_solution_loop, stats=None):
         self.simulation_group = simulation_group
         self.state = state
         self.do_solution_loop = do_solution_loop
+        self.stats = stats
+
+    def _current_stats(self, name):
+        if self.stats is None or self.stats.step < 0:
+            return None
+        return getattr(self.stats, name)[self.stats.step]
+
+    @property
+    def iterations(self):
+        """Outer iterations of the current time step by solution."""
+        return self._current_stats('iterations')
+
+    @property
+    def converged(self):
+        """Convergence flags of the current time step by solution."""
+        return self._current_stats('converged')
+
+    @property
+    def solve_time(self):
+        """Wall time in `solve` of the current time step by solution."""
+        return self._current_stats('solve_time')
+
+    @property
+    def user_time(self):
+        """Wall time in user code of the current time step by solution."""
+        return self._current_stats('user_time')
+
+    @property
+    def max_change(self):
+        """Maximum change of X of the current time step by solution."""
+        return self._current_stats('max_change')
 
     @property
     def available_states(self):
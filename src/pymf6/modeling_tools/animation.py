@@ -0,0 +1,174 @@
+"""Animations of heads or concentrations over time.
+
+Frames are rendered in a process pool. Each worker opens the indexed
+output file and receives the raster geometry of the grid only once, when
+it starts. Without a given color range, the workers first find the
+minimum and maximum of their share of the time steps. Rendering a frame
+then only reads one time step and draws one image with
+`plot_rasterized`. The frames are assembled into a GIF or video with
+`imageio`, install it with `pip install pymf6[animation]`.
+
+Usage example:
+
+>>> export_animation('model', 'model', 'heads.gif', kind='head')
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import imageio.v2 as imageio
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+from flopy.mf6.utils import MfGrdFile
+
+from pymf6.modeling_tools.binary_output import BinaryOutputFile
+from pymf6.modeling_tools.raster import GridRaster, NO_VALUE_LIMIT, plot_rasterized
+
+OUTPUT_NAMES = {
+    'head': ('{name}.hds', 'Groundwater level (m)'),
+    'concentration': ('gwt_{name}.ucn', 'Concentration'),
+}
+
+# Chunks of time steps per worker for finding the color range.
+RANGE_CHUNKS_PER_WORKER = 4
+
+# State of a worker process, set once by `_init_worker`.
+_worker = {}
+
+
+def _init_worker(output_path, nlay, modelgrid, raster, options):
+    """Open the output file and keep the grid geometry in the worker."""
+    _worker['output'] = BinaryOutputFile(output_path, nlay=nlay)
+    _worker['modelgrid'] = modelgrid
+    _worker['raster'] = raster
+    _worker['options'] = options
+
+
+def _render_frame(index, step, frame_path, vmin, vmax):
+    """Render time step `step` into the PNG file `frame_path`."""
+    output = _worker['output']
+    options = _worker['options']
+    values = output.read_step(step)[options['layer']]
+    fig = Figure(figsize=options['figsize'], dpi=options['dpi'])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    _, arr = plot_rasterized(
+        _worker['modelgrid'],
+        values,
+        ax=ax,
+        raster=_worker['raster'],
+        levels=options['levels'],
+        vmin=vmin,
+        vmax=vmax,
+    )
+    ax.set_xlabel('x (m)')
+    ax.set_ylabel('y (m)')
+    ax.set_title(f'{options["title"]} time: {output.times[step]:g}')
+    fig.colorbar(arr, ax=ax).set_label(options['label'])
+    fig.savefig(frame_path)
+    return index
+
+
+def _find_value_range(steps):
+    """Minimum and maximum of time steps ignoring inactive cells."""
+    output = _worker['output']
+    layer = _worker['options']['layer']
+    vmin, vmax = np.inf, -np.inf
+    for step in steps:
+        values = output.read_step(step)[layer]
+        values = values[np.abs(values) < NO_VALUE_LIMIT]
+        if values.size:
+            vmin = min(vmin, values.min())
+            vmax = max(vmax, values.max())
+    return vmin, vmax
+
+
+def export_animation(
+        model_path,
+        name,
+        out_file,
+        kind='head',
+        steps=None,
+        layer=0,
+        fps=10,
+        title='',
+        levels=None,
+        vmin=None,
+        vmax=None,
+        resolution=(800, 800),
+        figsize=(8, 6),
+        dpi=100,
+        max_workers=None):
+    """
+    Render an animation of heads or concentrations.
+
+    `model_path` - directory with the model output
+    `name` - name of the flow model
+    `out_file` - animation file, the extension selects the format,
+                 e.g. `.gif` or `.mp4` (needs `imageio-ffmpeg`)
+    `kind` - `'head'` or `'concentration'`
+    `steps` - indices of saved time steps to render, defaults to all
+    `vmin`, `vmax` - color range, defaults to the range of all frames;
+                     giving both saves reading all frames twice
+    `max_workers` - number of worker processes, defaults to all cores
+
+    Returns the path of the animation file.
+    """
+    model_path = Path(model_path)
+    file_pattern, label = OUTPUT_NAMES[kind]
+    output_path = model_path / file_pattern.format(name=name)
+    modelgrid = MfGrdFile(
+        str(model_path / f'{name}.dis.grb'), verbose=False
+    ).modelgrid
+    output = BinaryOutputFile(output_path, nlay=modelgrid.nlay)
+    if steps is None:
+        steps = range(output.nsteps)
+    steps = list(steps)
+    raster = GridRaster(modelgrid, resolution=resolution)
+    options = {
+        'layer': layer,
+        'levels': levels,
+        'title': title,
+        'label': label,
+        'figsize': figsize,
+        'dpi': dpi,
+    }
+    with TemporaryDirectory() as tmp_dir:
+        frame_paths = [
+            Path(tmp_dir) / f'frame_{index:06d}.png'
+            for index in range(len(steps))
+        ]
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(output_path, modelgrid.nlay, modelgrid, raster, options),
+        ) as executor:
+            if vmin is None or vmax is None:
+                nchunks = RANGE_CHUNKS_PER_WORKER * (
+                    max_workers or os.cpu_count() or 1
+                )
+                nchunks = max(min(nchunks, len(steps)), 1)
+                ranges = list(executor.map(
+                    _find_value_range, np.array_split(steps, nchunks)
+                ))
+                if vmin is None:
+                    vmin = min(low for low, _ in ranges)
+                if vmax is None:
+                    vmax = max(high for _, high in ranges)
+            futures = [
+                executor.submit(
+                    _render_frame, index, step, frame_path, vmin, vmax
+                )
+                for index, (step, frame_path) in enumerate(
+                    zip(steps, frame_paths)
+                )
+            ]
+            for future in futures:
+                future.result()
+        with imageio.get_writer(out_file, fps=fps) as writer:
+            for frame_path in frame_paths:
+                writer.append_data(imageio.imread(frame_path))
+    return Path(out_file)
@@ -0,0 +1,195 @@
+"""Fast access to MODFLOW 6 binary output and input files.
+
+Head and concentration files written by MODFLOW 6 consist of records
+with a fixed size. Each record holds a header and the values of one layer:
+
+* `kstp`, `kper` (int32)
+* `pertim`, `totim` (float64)
+* `text` (16 characters), e.g. `HEAD` or `CONCENTRATION`
+* `ncol`, `nrow`, `ilay` (int32)
+* `ncol * nrow` values (float64)
+
+Because all records of one file have the same size, the whole file can
+be mapped into memory as a NumPy structured array. This gives an index of
+all records without parsing the file and allows to read any range of time
+steps with one slicing operation.
+
+Binary array input files use the same header followed by all values of
+the array.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+HEADER_FIELDS = [
+    ('kstp', '<i4'),
+    ('kper', '<i4'),
+    ('pertim', '<f8'),
+    ('totim', '<f8'),
+    ('text', 'S16'),
+    ('ncol', '<i4'),
+    ('nrow', '<i4'),
+    ('ilay', '<i4'),
+]
+HEADER_DTYPE = np.dtype(HEADER_FIELDS)
+PRECISIONS = {'double': '<f8', 'single': '<f4'}
+
+
+def make_record_dtype(ncol, nrow, precision='double'):
+    """Make the dtype of one record including header and values."""
+    return np.dtype(
+        HEADER_FIELDS + [('data', PRECISIONS[precision], (nrow * ncol,))]
+    )
+
+
+class BinaryOutputFile:
+    """
+    Memory-mapped MODFLOW 6 head or concentration file.
+
+    `path` - path to the binary output file
+    `nlay` - number of layers, determined from the file if not given;
+             needed for files with only one time step
+    `precision` - `'double'` (MODFLOW 6 default) or `'single'`
+
+    The file can still be written by a running model. Only complete time
+    steps are visible. Call `refresh()` to see new time steps.
+    Without `nlay`, no time step is visible before the first layer of the
+    second time step is written.
+
+    Usage example:
+
+    >>> heads = BinaryOutputFile('model/model.hds')
+    >>> heads.times
+    >>> heads.read_steps(10, 20).shape
+    (10, 1, 10, 10)
+    """
+
+    def __init__(self, path, nlay=None, precision='double'):
+        self.path = Path(path)
+        self.precision = precision
+        header = np.fromfile(self.path, dtype=HEADER_DTYPE, count=1)
+        if not header.size:
+            raise ValueError(f'No records found in {self.path}.')
+        self.text = header['text'][0].decode('ascii').strip()
+        self.ncol = int(header['ncol'][0])
+        self.nrow = int(header['nrow'][0])
+        self.record_dtype = make_record_dtype(
+            self.ncol, self.nrow, precision=precision
+        )
+        self._nlay = nlay
+        self.records = None
+        self.nlay = None
+        self.nsteps = 0
+        self.refresh()
+
+    def refresh(self):
+        """
+        Map the file again if it has grown.
+
+        Returns the number of new complete time steps.
+        """
+        old_nsteps = self.nsteps
+        nrecords = self.path.stat().st_size // self.record_dtype.itemsize
+        if not nrecords:
+            return 0
+        records = np.memmap(
+            self.path, dtype=self.record_dtype, mode='r', shape=(nrecords,)
+        )
+        if self.nlay is None:
+            self.nlay = self._nlay or self._find_nlay(records)
+            if self.nlay is None:
+                return 0
+        self.nsteps = nrecords // self.nlay
+        self.records = records[: self.nsteps * self.nlay]
+        return self.nsteps - old_nsteps
+
+    @staticmethod
+    def _find_nlay(records):
+        """Find number of layers from the repeating layer numbers.
+
+        Returns `None` if no layer number has repeated yet, e.g. while
+        the first time step is written.
+        """
+        ilay = records['ilay']
+        restarts = np.flatnonzero(ilay[1:] <= ilay[:-1])
+        if restarts.size:
+            return int(restarts[0]) + 1
+        return None
+
+    @property
+    def shape(self):
+        """Shape of one time step as (nlay, nrow, ncol)."""
+        return (self.nlay, self.nrow, self.ncol)
+
+    @property
+    def ncells(self):
+        """Number of cells of one time step."""
+        return self.nlay * self.nrow * self.ncol
+
+    @property
+    def headers(self):
+        """Headers of the first layer of all time steps."""
+        return self.records[:: self.nlay][[name for name, _ in HEADER_FIELDS]]
+
+    @property
+    def times(self):
+        """Simulation times of all time steps."""
+        return np.asarray(self.records['totim'][:: self.nlay])
+
+    @property
+    def kstpkper(self):
+        """Zero-based time step and stress period of all time steps."""
+        first = self.records[:: self.nlay]
+        return np.column_stack([first['kstp'] - 1, first['kper'] - 1])
+
+    def read_steps(self, start=0, stop=None):
+        """Read time steps `start` up to `stop` as (n, nlay, nrow, ncol)."""
+        if stop is None:
+            stop = self.nsteps
+        data = self.records['data'][start * self.nlay: stop * self.nlay]
+        return np.asarray(data).reshape((-1,) + self.shape)
+
+    def read_step(self, index):
+        """Read one time step as (nlay, nrow, ncol)."""
+        if index < 0:
+            index += self.nsteps
+        return self.read_steps(index, index + 1)[0]
+
+
+def write_binary_array(path, array, text='', skip_unchanged=False):
+    """
+    Write an array as MODFLOW 6 binary input file.
+
+    The file can be used with `OPEN/CLOSE path (BINARY)`.
+    `array` - 2D (nrow, ncol) or 3D (nlay, nrow, ncol) array
+    `text` - up to 16 characters describing the array
+    `skip_unchanged` - do not write if the file already holds the values
+
+    Returns `True` if the file was written.
+    """
+    path = Path(path)
+    array = np.asarray(array, dtype='<f8')
+    if array.ndim == 2:
+        array = array[np.newaxis]
+    nlay, nrow, ncol = array.shape
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header['kstp'] = 1
+    header['kper'] = 1
+    header['pertim'] = 1.0
+    header['totim'] = 1.0
+    header['text'] = text.upper().rjust(16)[:16].encode('ascii')
+    header['ncol'] = ncol
+    header['nrow'] = nrow
+    # MF6 compares ncol * nrow * ilay with the number of array values.
+    header['ilay'] = nlay
+    content = header.tobytes() + np.ascontiguousarray(array).tobytes()
+    if (
+        skip_unchanged
+        and path.exists()
+        and path.stat().st_size == len(content)
+        and path.read_bytes() == content
+    ):
+        return False
+    path.write_bytes(content)
+    return True
@@ -0,0 +1,204 @@
+"""Convert MODFLOW 6 output files into labelled xarray data sets.
+
+The output is written as chunked Zarr store. The records of an output file
+are split into ranges of time steps that align with the Zarr chunks.
+The ranges are converted in a process pool. Each worker writes its own
+region of the store, so no two processes touch the same chunk.
+
+Usage example:
+
+>>> output_to_zarr('model', 'model.hds', 'heads.zarr')
+>>> heads = open_output_zarr('heads.zarr')
+>>> heads.head.sel(layer=1).isel(time=-1)
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import dask.array
+import numpy as np
+import xarray as xr
+from flopy.mf6.utils import MfGrdFile
+from flopy.utils import CellBudgetFile
+
+from pymf6.modeling_tools.binary_output import BinaryOutputFile
+
+# Aim at about 64 MB of uncompressed data per chunk.
+CHUNK_BYTES = 64 * 1024**2
+DIMS = ('time', 'layer', 'row', 'col')
+
+
+def get_grid_coords(model_path, name):
+    """
+    Get cell coordinates from the binary grid file of the DIS package.
+
+    Returns a dict with the coordinates `layer`, `row`, `col`, `x` and `y`.
+    """
+    grb_file = Path(model_path) / f'{name}.dis.grb'
+    grid = MfGrdFile(str(grb_file), verbose=False).modelgrid
+    return {
+        'layer': np.arange(1, grid.nlay + 1),
+        'row': np.arange(1, grid.nrow + 1),
+        'col': np.arange(1, grid.ncol + 1),
+        'x': (('row', 'col'), grid.xcellcenters),
+        'y': (('row', 'col'), grid.ycellcenters),
+    }
+
+
+def _find_steps_per_chunk(ncells, steps_per_chunk):
+    if steps_per_chunk:
+        return steps_per_chunk
+    return max(1, CHUNK_BYTES // (ncells * 8))
+
+
+def _read_budget_steps(bud_path, names, shape, start, stop, precision):
+    """Read full grid arrays of all budget terms for a range of steps."""
+    budget = CellBudgetFile(str(bud_path), precision=precision)
+    kstpkper = budget.get_kstpkper()[start:stop]
+    data = {}
+    for name in names:
+        values = np.full((len(kstpkper),) + shape, np.nan)
+        for index, step in enumerate(kstpkper):
+            record = budget.get_data(kstpkper=step, text=name, full3D=True)
+            if record:
+                values[index] = np.ma.filled(
+                    np.ma.asarray(record[0], dtype=float), np.nan
+                ).reshape(shape)
+        data[name] = values
+    budget.close()
+    return data
+
+
+def _find_budget_names(budget, ncells):
+    """Find all budget terms that can be represented as grid arrays."""
+    names = []
+    # `idx` and `text` select records with both, use the first time step.
+    first_step = budget.get_kstpkper()[0]
+    for raw_name in budget.get_unique_record_names():
+        name = raw_name.decode('ascii').strip()
+        if name == 'FLOW-JA-FACE':
+            continue
+        record = budget.get_data(kstpkper=first_step, text=name, full3D=True)
+        if record and np.size(record[0]) == ncells:
+            names.append(name)
+    return names
+
+
+def _convert_range(kind, out_path, var_name, start, stop, options):
+    """Convert time steps `start` to `stop` and write them into the store."""
+    if kind == 'budget':
+        data = _read_budget_steps(
+            options['path'], options['names'], options['shape'], start, stop,
+            options['precision'],
+        )
+        data_vars = {
+            name.lower(): (DIMS, values) for name, values in data.items()
+        }
+    else:
+        output = BinaryOutputFile(
+            options['path'],
+            nlay=options['shape'][0],
+            precision=options['precision'],
+        )
+        data_vars = {var_name: (DIMS, output.read_steps(start, stop))}
+    dataset = xr.Dataset(data_vars)
+    dataset.to_zarr(out_path, region={'time': slice(start, stop)})
+    return stop - start
+
+
+def output_to_zarr(
+        model_path,
+        file_name,
+        out_path,
+        name=None,
+        kind=None,
+        steps_per_chunk=None,
+        max_workers=None,
+        precision='double'):
+    """
+    Convert a head, concentration or budget file into a Zarr store.
+
+    `model_path` - directory with output and the `<name>.dis.grb` file
+    `file_name` - name of the output file, e.g. `model.hds`
+    `out_path` - path of the Zarr store, overwritten if it exists
+    `name` - name of the flow model, defaults to the stem of `file_name`
+    `kind` - `'head'`, `'concentration'`, or `'budget'`,
+             determined from the file extension if not given
+    `steps_per_chunk` - time steps per Zarr chunk,
+                        defaults to about 64 MB per chunk
+    `max_workers` - number of worker processes, defaults to all cores
+
+    Returns the lazily opened data set.
+    """
+    model_path = Path(model_path)
+    path = model_path / file_name
+    if kind is None:
+        kind = {
+            '.hds': 'head',
+            '.ucn': 'concentration',
+            '.bud': 'budget',
+            '.cbc': 'budget',
+        }[path.suffix.lower()]
+    if name is None:
+        name = path.stem
+        if kind == 'concentration' and name.startswith('gwt_'):
+            name = name[len('gwt_'):]
+    coords = get_grid_coords(model_path, name)
+    shape = tuple(len(coords[dim]) for dim in DIMS[1:])
+    options = {'path': path, 'shape': shape, 'precision': precision}
+    if kind == 'budget':
+        budget = CellBudgetFile(str(path), precision=precision)
+        times = np.asarray(budget.get_times())
+        kstpkper = np.asarray(budget.get_kstpkper())
+        options['names'] = _find_budget_names(budget, np.prod(shape))
+        budget.close()
+        var_names = [name.lower() for name in options['names']]
+    else:
+        output = BinaryOutputFile(path, nlay=shape[0], precision=precision)
+        times = output.times
+        kstpkper = output.kstpkper
+        var_names = [kind]
+    nsteps = len(times)
+    steps_per_chunk = _find_steps_per_chunk(np.prod(shape), steps_per_chunk)
+    chunks = (steps_per_chunk,) + shape
+    template = xr.Dataset(
+        {
+            var_name: (
+                DIMS,
+                dask.array.zeros((nsteps,) + shape, chunks=chunks),
+            )
+            for var_name in var_names
+        },
+        coords={
+            **coords,
+            'time': times,
+            'kstp': ('time', kstpkper[:, 0]),
+            'kper': ('time', kstpkper[:, 1]),
+        },
+    )
+    template.to_zarr(out_path, mode='w', compute=False)
+    ranges = [
+        (start, min(start + steps_per_chunk, nsteps))
+        for start in range(0, nsteps, steps_per_chunk)
+    ]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _convert_range,
+                kind,
+                out_path,
+                var_names[0],
+                start,
+                stop,
+                options,
+            )
+            for start, stop in ranges
+        ]
+        for future in futures:
+            future.result()
+    return open_output_zarr(out_path)
+
+
+def open_output_zarr(path):
+    """Open a converted output lazily with dask arrays."""
+    return xr.open_zarr(path, chunks={})
@@ -1,18 +1,57 @@
 """Create and run a MODFLOW 6 model with flopy.
 """
 
+from collections import OrderedDict
+import hashlib
+from io import StringIO
+import json
+import os
+from pathlib import Path
+
 import flopy
+from flopy.mf6.mfbase import ExtFileAction
+import numpy as np
 
 import pymf6
+from pymf6.modeling_tools.binary_output import (
+    BinaryOutputFile,
+    write_binary_array,
+)
+from pymf6.workspace import is_input_file
 
 MF6EXE = pymf6.__mf6_exe__
+# Number of loaded simulations kept by `get_cached_simulation`.
+SIMULATION_CACHE_SIZE = 8
+
+# Hashes of the files written by `write_simulation_incremental`.
+# The name matches `pymf6.workspace.PYMF6_FILE_PATTERNS`, so the manifest
+# is not treated as model input.
+MANIFEST_NAME = '.pymf6_manifest.json'
+
+_simulation_cache = OrderedDict()
 
 
 def make_input(
         model_data,
         exe_name=MF6EXE,
-        verbosity_level=0):
-    """Create MODFLOW 6 input"""
+        verbosity_level=0,
+        incremental=False,
+        binary_arrays=False,
+        spinup_cache=None):
+    """Create MODFLOW 6 input
+
+    `incremental` - only write files whose content differs from the
+                    files in an existing workspace,
+                    see `write_simulation_incremental`
+    `binary_arrays` - write the grid arrays `top`, `botm`, `k`, `k33`,
+                      `sy`, and `ss` as binary files, which is much faster
+                      to write and to read by MF6 for large grids
+    `spinup_cache` - directory with converged heads of the steady-state
+                     first stress period; if heads for the same inputs
+                     exist, they are used as initial heads, so the
+                     steady state converges immediately,
+                     see `store_spinup_heads`
+    """
     sim = flopy.mf6.MFSimulation(
         sim_name=model_data['name'],
         sim_ws=model_data['model_path'],
@@ -28,7 +67,7 @@ def make_input(
         nper=repeat_times + 1,
         perioddata=tdis_rc,
     )
-    flopy.mf6.ModflowIms(sim)
+    ims = flopy.mf6.ModflowIms(sim)
     gwf = flopy.mf6.ModflowGwf(
         sim,
         modelname=model_data['name'],
@@ -36,24 +75,38 @@ def make_input(
     dim_kwargs = {name: model_data[name] for name in
               ['nrow', 'ncol', 'nlay', 'delr', 'delc', 'top', 'botm']
               }
+    arrays = {name: model_data[name] for name in ['k', 'k33', 'sy', 'ss']}
+    if binary_arrays:
+        shape = (model_data['nlay'], model_data['nrow'], model_data['ncol'])
+        for name in ['top', 'botm']:
+            dim_kwargs[name] = binary_array_input(
+                model_data, name, dim_kwargs[name], shape
+            )
+        for name, values in arrays.items():
+            arrays[name] = binary_array_input(
+                model_data, name, values, shape
+            )
     model_data['dim_kwargs'] = dim_kwargs
     flopy.mf6.ModflowGwfdis(gwf, **dim_kwargs)
-    flopy.mf6.ModflowGwfic(gwf)
+    ic = flopy.mf6.ModflowGwfic(gwf)
     flopy.mf6.ModflowGwfnpf(
         gwf,
         save_flows=True,
         save_specific_discharge=True,
         icelltype=[0],
-        k=model_data['k'],
-        k33=model_data['k33'],
-    )
-    sy = flopy.mf6.ModflowGwfsto.sy.empty(
-        gwf,
-        default_value=model_data['sy']
-    )
-    ss = flopy.mf6.ModflowGwfsto.ss.empty(
-        gwf, default_value=model_data['ss']
+        k=arrays['k'],
+        k33=arrays['k33'],
     )
+    if binary_arrays:
+        sy, ss = arrays['sy'], arrays['ss']
+    else:
+        sy = flopy.mf6.ModflowGwfsto.sy.empty(
+            gwf,
+            default_value=model_data['sy']
+        )
+        ss = flopy.mf6.ModflowGwfsto.ss.empty(
+            gwf, default_value=model_data['ss']
+        )
     flopy.mf6.ModflowGwfsto(
         gwf,
         pname="sto",
@@ -105,7 +158,204 @@ def make_input(
     if model_data['transport']:
         make_transport_model(sim, model_data)
 
-    sim.write_simulation()
+    if spinup_cache is not None:
+        spinup_hash = steady_state_hash(
+            gwf, ims, tdis_rc[0], model_data, binary_arrays
+        )
+        model_data['spinup_hash'] = spinup_hash
+        spinup_path = Path(spinup_cache) / f'{spinup_hash}.npy'
+        if spinup_path.exists():
+            ic.strt.set_data(np.load(spinup_path))
+
+    if incremental:
+        write_simulation_incremental(sim)
+    else:
+        sim.write_simulation()
+
+
+def binary_array_input(model_data, array_name, values, shape):
+    """Write values as MF6 binary array file and return the flopy input.
+
+    `values` - scalar, one value per layer, or full array
+    `shape` - grid shape as (nlay, nrow, ncol), `top` uses (nrow, ncol)
+
+    The file `<name>.<array_name>.bin` in the model path is only
+    written if its values changed.
+    """
+    if array_name == 'top':
+        shape = shape[1:]
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1 and len(shape) == 3 and values.size == shape[0]:
+        values = values.reshape(-1, 1, 1)
+    file_name = f'{model_data["name"]}.{array_name}.bin'
+    model_path = Path(model_data['model_path'])
+    model_path.mkdir(parents=True, exist_ok=True)
+    write_binary_array(
+        model_path / file_name,
+        np.broadcast_to(values, shape),
+        text=array_name,
+        skip_unchanged=True,
+    )
+    return {'filename': file_name, 'binary': True, 'factor': 1.0}
+
+
+def _update_hash(digest, values):
+    """Add all values of an array to `digest`.
+
+    `repr()` of large arrays is truncated, so the bytes are used.
+    Records with objects, e.g. cell ids, are hashed as list.
+    """
+    if values is None:
+        digest.update(b'None')
+        return
+    values = np.asarray(values)
+    if values.dtype.hasobject:
+        digest.update(repr(values.tolist()).encode('utf-8'))
+        return
+    digest.update(f'{values.dtype.descr} {values.shape}'.encode('utf-8'))
+    digest.update(np.ascontiguousarray(values).tobytes())
+
+
+def steady_state_hash(gwf, ims, first_period, model_data, binary_arrays):
+    """Hash of all inputs that determine the steady-state heads.
+
+    These are the DIS, NPF, CHD, and IMS packages, the convertible cell
+    setting of STO, the length of the first stress period, and the wells
+    of the first stress period. Storage values and all later stress
+    periods do not change the steady state.
+    """
+    digest = hashlib.sha256()
+    for package in [gwf.get_package(name) for name in ['dis', 'npf', 'chd']]:
+        digest.update(_package_text(package).encode('utf-8'))
+    digest.update(_package_text(ims).encode('utf-8'))
+    _update_hash(digest, gwf.get_package('sto').iconvert.get_data())
+    _update_hash(digest, first_period)
+    _update_hash(
+        digest, gwf.get_package('wel').stress_period_data.get_data(0)
+    )
+    if binary_arrays:
+        model_path = Path(model_data['model_path'])
+        for array_name in ['top', 'botm', 'k', 'k33']:
+            file_name = f'{model_data["name"]}.{array_name}.bin'
+            digest.update((model_path / file_name).read_bytes())
+    return digest.hexdigest()
+
+
+def store_spinup_heads(model_data, spinup_cache):
+    """Store the converged heads of the steady-state first stress period.
+
+    Call after running a model created with `make_input` and the same
+    `spinup_cache`. Later models with the same steady-state inputs start
+    from these heads.
+    """
+    model_path = Path(model_data['model_path'])
+    heads = BinaryOutputFile(
+        model_path / f'{model_data["name"]}.hds', nlay=model_data['nlay']
+    )
+    first_period = np.flatnonzero(heads.kstpkper[:, 1] == 0)
+    if not first_period.size:
+        raise ValueError('No heads saved for the first stress period.')
+    spinup_cache = Path(spinup_cache)
+    spinup_cache.mkdir(parents=True, exist_ok=True)
+    np.save(
+        spinup_cache / f'{model_data["spinup_hash"]}.npy',
+        heads.read_step(first_period[-1]),
+    )
+
+
+def _iter_packages(sim):
+    """All packages of a simulation that have their own file.
+
+    Child packages such as OBS and TS are part of `packagelist`.
+    """
+    yield sim.name_file
+    yield from sim.sim_package_list
+    for model_name in sim.model_names:
+        model = sim.get_model(model_name)
+        yield model.name_file
+        yield from model.packagelist
+
+
+def _package_text(package):
+    """Content of the file of a flopy package, without the flopy header.
+
+    Data in external files is not included, only the references to them.
+    """
+    # pylint: disable=protected-access
+    if package.simulation_data.auto_set_sizes:
+        package._update_size_defs()
+    fobj = StringIO()
+    package._write_blocks(fobj, ExtFileAction.copy_none)
+    return fobj.getvalue()
+
+
+def _file_state(path):
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def write_simulation_incremental(sim):
+    """Write only packages whose content changed since the last write.
+
+    The content of each package file, including child packages such as
+    OBS and TS, is generated once and hashed.
+    A package file is written if its hash differs from the manifest file
+    `MANIFEST_NAME` in the simulation workspace or if the file was
+    modified or removed after the last write. Files are written to a
+    temporary file and renamed, so hard links to the old file, e.g. of a
+    `pymf6.workspace.Workspace`, are not changed.
+    If there is no manifest, all package files are written.
+
+    External files, e.g. the binary arrays of `binary_array_input`, are
+    only referenced by the packages. They are written by their creator
+    and their states are stored in the manifest as well.
+
+    Returns the paths of the written package files and of the external
+    files that changed since the last write.
+    """
+    sim_ws = Path(sim.sim_path)
+    sim_ws.mkdir(parents=True, exist_ok=True)
+    manifest_path = sim_ws / MANIFEST_NAME
+    manifest = {}
+    if manifest_path.exists():
+        with open(manifest_path, encoding='utf-8') as fobj:
+            manifest = json.load(fobj)
+    packages = {}
+    for package in _iter_packages(sim):
+        packages.setdefault(Path(package.get_file_path()), package)
+    written = []
+    new_manifest = {}
+    for path, package in packages.items():
+        text = _package_text(package)
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        name = path.relative_to(sim_ws).as_posix()
+        entry = manifest.get(name)
+        if (
+            entry is None
+            or entry.get('hash') != digest
+            or not path.exists()
+            or entry['state'] != _file_state(path)
+        ):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f'.pymf6_{path.name}.tmp')
+            tmp_path.write_text(text, encoding='utf-8')
+            os.replace(tmp_path, path)
+            written.append(path)
+        new_manifest[name] = {'hash': digest, 'state': _file_state(path)}
+    for path in sorted(sim_ws.rglob('*')):
+        name = path.relative_to(sim_ws).as_posix()
+        if name in new_manifest or not path.is_file():
+            continue
+        if not is_input_file(path):
+            continue
+        state = _file_state(path)
+        entry = manifest.get(name)
+        if entry is None or entry['state'] != state:
+            written.append(path)
+        new_manifest[name] = {'state': state}
+    with open(manifest_path, 'w', encoding='utf-8') as fobj:
+        json.dump(new_manifest, fobj, indent=1)
+    return written
 
 
 def make_transport_model(sim, model_data):
@@ -235,6 +485,45 @@ def get_simulation(model_path, exe_name=MF6EXE, verbosity_level=0):
     return sim
 
 
+def _input_signature(model_path):
+    """Names, modification times, and sizes of all input files."""
+    signature = []
+    for path in sorted(Path(model_path).iterdir()):
+        if path.is_file() and is_input_file(path):
+            stat = path.stat()
+            signature.append((path.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def get_cached_simulation(model_path, exe_name=MF6EXE, verbosity_level=0):
+    """Get simulation for a model, loaded only if the inputs changed.
+
+    Loaded simulations are kept in memory keyed by the simulation path.
+    A simulation is loaded again if any input file was modified.
+    The least recently used simulation is removed if more than
+    `SIMULATION_CACHE_SIZE` simulations are loaded.
+    """
+    key = Path(model_path).resolve()
+    signature = _input_signature(key)
+    entry = _simulation_cache.get(key)
+    if entry is not None and entry[0] == signature:
+        _simulation_cache.move_to_end(key)
+        return entry[1]
+    sim = get_simulation(
+        model_path, exe_name=exe_name, verbosity_level=verbosity_level
+    )
+    _simulation_cache[key] = (signature, sim)
+    _simulation_cache.move_to_end(key)
+    while len(_simulation_cache) > SIMULATION_CACHE_SIZE:
+        _simulation_cache.popitem(last=False)
+    return sim
+
+
+def clear_simulation_cache():
+    """Remove all loaded simulations from the cache."""
+    _simulation_cache.clear()
+
+
 def run_simulation(model_path, verbosity_level=0):
     """Run a MODFLOW 6 model"""
     sim = get_simulation(
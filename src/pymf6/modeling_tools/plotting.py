@@ -7,7 +7,60 @@ import numpy as np
 import flopy
 from flopy.utils.postprocessing import get_specific_discharge
 
-from pymf6.modeling_tools. make_model import get_simulation
+from pymf6.modeling_tools.make_model import get_cached_simulation
+from pymf6.modeling_tools.raster import (
+    GridRaster,
+    plot_rasterized,
+    plot_vectors,
+)
+
+
+def _plot_well_cells(ax, gwf, kper=1):
+    """Mark the cells of all wells at their cell centers."""
+    cellids = gwf.get_package('wel').stress_period_data.get_data(kper)['cellid']
+    grid = gwf.modelgrid
+    x = [grid.xcellcenters[cellid[1:]] for cellid in cellids]
+    y = [grid.ycellcenters[cellid[1:]] for cellid in cellids]
+    return ax.scatter(x, y, marker='s', color='red', label='WEL')
+
+
+def _show_rasterized(
+        gwf,
+        values,
+        title,
+        label,
+        levels=None,
+        show_contours=True,
+        qx=None,
+        qy=None,
+        show_wells=True,
+        resolution=(800, 800),
+        vmin=None,
+        vmax=None):
+    """
+    Plot values of the first layer rasterized to `resolution`.
+
+    Contours use the default levels of matplotlib if `levels` is `None`.
+    Returns the last artist drawn, like the `PlotMapView` variants: the
+    arrows, the wells, or the image.
+    """
+    raster = GridRaster(gwf.modelgrid, resolution=resolution)
+    ax, arr = plot_rasterized(
+        gwf.modelgrid, values[0], raster=raster, vmin=vmin, vmax=vmax
+    )
+    plot = arr
+    if show_contours:
+        ax.contour(raster.x, raster.y, arr.get_array(), levels=levels)
+    if show_wells:
+        plot = _plot_well_cells(ax, gwf)
+    if qx is not None and qy is not None:
+        plot = plot_vectors(ax, raster, qx[0], qy[0])
+    ax.set_xlabel('x (m)')
+    ax.set_ylabel('y (m)')
+    ax.set_title(title)
+    cbar = ax.get_figure().colorbar(arr, ticks=levels)
+    cbar.set_label(label)
+    return plot
 
 
 def show_heads(
@@ -15,17 +68,36 @@ def show_heads(
         name,
         title='',
         show_grid=True,
-        show_wells=True):
-    """Plot calculated heads along with flow vector."""
-    sim = get_simulation(model_path, name)
+        show_wells=True,
+        rasterize=False,
+        resolution=(800, 800)):
+    """Plot calculated heads along with flow vector.
+
+    `rasterize` - draw heads as image with `resolution` pixels instead of
+                  one polygon per cell, useful for very large grids;
+                  `show_grid` is ignored
+    """
+    sim = get_cached_simulation(model_path)
     gwf = sim.get_model(name)
 
     head = gwf.output.head().get_data(kstpkper=(119, 2))
     bud = gwf.output.budget()
     spdis = bud.get_data(text='DATA-SPDIS')[240]
     qx, qy, _ = get_specific_discharge(spdis, gwf)
-    pmv = flopy.plot.PlotMapView(gwf)
     levels=np.arange(0.2, 1.4, 0.02)
+    if rasterize:
+        return _show_rasterized(
+            gwf,
+            head,
+            title=title,
+            label='Groundwater level (m)',
+            levels=levels,
+            qx=qx,
+            qy=qy,
+            show_wells=show_wells,
+            resolution=resolution,
+        )
+    pmv = flopy.plot.PlotMapView(gwf)
     arr = pmv.plot_array(head)
     if show_grid:
         pmv.plot_grid(colors='white')
@@ -57,7 +129,7 @@ def show_bcs(
         show_grid=True):
     """Show location of boundary conditions."""
     handles = []
-    sim = get_simulation(model_path, name)
+    sim = get_cached_simulation(model_path)
     gwf = sim.get_model(name)
     pmv = flopy.plot.PlotMapView(gwf)
 
@@ -88,20 +160,46 @@ def show_concentration(
         vmin=None,
         vmax=None,
         show_contours=True,
-        show_arrows=False,):
-    """Plot calculated heads along with flow vector."""
+        show_arrows=False,
+        rasterize=False,
+        resolution=(800, 800)):
+    """Plot calculated heads along with flow vector.
+
+    `rasterize` - draw concentrations as image with `resolution` pixels
+                  instead of one polygon per cell, useful for very large
+                  grids; `show_grid` is ignored
+    """
     gwtname = 'gwt_' + name
-    sim = get_simulation(model_path, name)
+    sim = get_cached_simulation(model_path)
     gwt = sim.get_model(gwtname)
 
     conc = gwt.output.concentration().get_data(kstpkper)
+    if rasterize:
+        gwf = sim.get_model(name)
+        qx = qy = None
+        if show_arrows:
+            spdis = gwf.output.budget().get_data(text='DATA-SPDIS')[240]
+            qx, qy, _ = get_specific_discharge(spdis, gwf)
+        return _show_rasterized(
+            gwf,
+            conc,
+            title=title,
+            label='Concentration',
+            levels=levels,
+            show_contours=show_contours,
+            qx=qx,
+            qy=qy,
+            show_wells=show_wells,
+            resolution=resolution,
+            vmin=vmin,
+            vmax=vmax,
+        )
     pmv = flopy.plot.PlotMapView(gwt)
     arr = pmv.plot_array(conc, vmin=vmin, vmax=vmax)
     if show_grid:
         pmv.plot_grid(colors='white')
     if show_wells:
-        flow_sim = get_simulation(model_path, name)
-        gwf = flow_sim.get_model(name)
+        gwf = sim.get_model(name)
         plot = pmv.plot_bc(package=gwf.get_package('wel'), plotAll=True, kper=1)
     if show_contours:
         pmv.contour_array(
@@ -134,11 +232,20 @@ def show_well_head(
         y_end=1.05,
         upper_head_limit=None,
         lower_head_limit=None,
-        x=(0, 32)):
-    """Plot head at well over time."""
-    sim = get_simulation(model_data['model_path'], model_data['name'])
-    gwf = sim.get_model(model_data['name'])
-    heads = gwf.output.head().get_ts(wel_coords)
+        x=(0, 32),
+        ts_cache=None):
+    """Plot head at well over time.
+
+    `ts_cache` - optional `CellTimeSeriesCache` of the head file,
+                 reads the time series without scanning the whole file
+    """
+    if ts_cache is not None:
+        ts_cache.refresh()
+        heads = ts_cache.get_ts(wel_coords)
+    else:
+        sim = get_cached_simulation(model_data['model_path'])
+        gwf = sim.get_model(model_data['name'])
+        heads = gwf.output.head().get_ts(wel_coords)
     _, ax = plt.subplots()
     ax.plot(heads[:, 0], heads[:, 1], label='Well water level')
     ax.set_xlabel('Time (d)')
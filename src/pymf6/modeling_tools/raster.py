@@ -0,0 +1,162 @@
+"""Render cell values of large grids as raster images.
+
+Drawing every cell of a grid as polygon takes a lot of time and memory for
+grids with millions of cells. This module maps cell values onto a raster
+with the resolution of the figure instead. The work only depends on the
+number of pixels, not on the number of cells:
+
+* structured grids: every pixel looks up the cell that contains its
+  center via the cell edges
+* vertex grids: cell centers are binned into pixels and averaged
+
+Contours are computed from the raster and flow vectors are subsampled to a
+fixed number of arrows.
+"""
+
+from matplotlib import pyplot as plt
+import numpy as np
+
+# MF6 uses values of this magnitude for inactive and dry cells.
+NO_VALUE_LIMIT = 1e29
+
+
+def _as_float(values):
+    """Flatten values and replace masked or no-flow values with NaN."""
+    values = np.ma.filled(np.ma.asarray(values, dtype=float), np.nan).ravel()
+    values[np.abs(values) >= NO_VALUE_LIMIT] = np.nan
+    return values
+
+
+class GridRaster:
+    """
+    Mapping between the cells of one layer and the pixels of an image.
+
+    `modelgrid` - flopy model grid, e.g. `gwf.modelgrid`
+    `resolution` - image size in pixels as (width, height)
+    """
+
+    def __init__(self, modelgrid, resolution=(800, 800)):
+        self.width, self.height = resolution
+        self.structured = modelgrid.grid_type == 'structured'
+        if self.structured:
+            xedges, yedges = modelgrid.xyedges
+            xmin, xmax = xedges[0], xedges[-1]
+            ymin, ymax = yedges[-1], yedges[0]
+        else:
+            xcenters = np.ravel(modelgrid.xcellcenters)
+            ycenters = np.ravel(modelgrid.ycellcenters)
+            xmin, xmax, ymin, ymax = modelgrid.extent
+        self.extent = (xmin, xmax, ymin, ymax)
+        # pixel centers, rows from top to bottom
+        self.x = xmin + (np.arange(self.width) + 0.5) * (
+            (xmax - xmin) / self.width
+        )
+        self.y = ymax - (np.arange(self.height) + 0.5) * (
+            (ymax - ymin) / self.height
+        )
+        if self.structured:
+            cols = np.searchsorted(xedges, self.x, side='right') - 1
+            rows = np.searchsorted(-yedges, -self.y, side='right') - 1
+            cols = np.clip(cols, 0, modelgrid.ncol - 1)
+            rows = np.clip(rows, 0, modelgrid.nrow - 1)
+            self.cell_index = rows[:, np.newaxis] * modelgrid.ncol + cols
+        else:
+            ix = ((xcenters - xmin) / (xmax - xmin) * self.width).astype(int)
+            iy = ((ymax - ycenters) / (ymax - ymin) * self.height).astype(int)
+            ix = np.clip(ix, 0, self.width - 1)
+            iy = np.clip(iy, 0, self.height - 1)
+            self.pixel_index = iy * self.width + ix
+
+    def rasterize(self, values):
+        """Map the values of one layer to an image of (height, width)."""
+        values = _as_float(values)
+        if self.structured:
+            return values[self.cell_index]
+        valid = ~np.isnan(values)
+        size = self.width * self.height
+        sums = np.bincount(
+            self.pixel_index[valid], weights=values[valid], minlength=size
+        )
+        counts = np.bincount(self.pixel_index[valid], minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            image = sums / counts
+        return image.reshape(self.height, self.width)
+
+    def sample_vectors(self, qx, qy, density=25):
+        """
+        Subsample a vector field to `density` arrows along the longer side.
+
+        Returns x, y, u, v for `matplotlib.axes.Axes.quiver`.
+        """
+        step = max(self.width, self.height) / density
+        cols = np.arange(step / 2, self.width, step).astype(int)
+        rows = np.arange(step / 2, self.height, step).astype(int)
+        if self.structured:
+            index = self.cell_index[np.ix_(rows, cols)]
+            u = _as_float(qx)[index]
+            v = _as_float(qy)[index]
+        else:
+            u = self.rasterize(qx)[np.ix_(rows, cols)]
+            v = self.rasterize(qy)[np.ix_(rows, cols)]
+        x, y = np.meshgrid(self.x[cols], self.y[rows])
+        return x, y, u, v
+
+
+def plot_vectors(ax, raster, qx, qy, density=25):
+    """
+    Draw normalized arrows of a vector field sampled with `raster`.
+
+    Returns the `Quiver` of the arrows.
+    """
+    x, y, u, v = raster.sample_vectors(qx, qy, density=density)
+    length = np.hypot(u, v)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        u, v = u / length, v / length
+    return ax.quiver(x, y, u, v, color='white')
+
+
+def plot_rasterized(
+        modelgrid,
+        values,
+        ax=None,
+        resolution=(800, 800),
+        levels=None,
+        qx=None,
+        qy=None,
+        arrow_density=25,
+        vmin=None,
+        vmax=None,
+        contour_kwargs=None,
+        raster=None):
+    """
+    Plot the values of one layer as raster image.
+
+    `values` - cell values of one layer
+    `levels` - contour levels, no contours if `None`
+    `qx`, `qy` - components of a flow vector field, no arrows if `None`
+    `raster` - existing `GridRaster` for `modelgrid`, e.g. to draw many
+               frames, `resolution` is ignored if given
+
+    Returns the axes and the image.
+    """
+    if ax is None:
+        _, ax = plt.subplots()
+    if raster is None:
+        raster = GridRaster(modelgrid, resolution=resolution)
+    image = raster.rasterize(values)
+    arr = ax.imshow(
+        image,
+        extent=raster.extent,
+        origin='upper',
+        interpolation='nearest',
+        vmin=vmin,
+        vmax=vmax,
+    )
+    if levels is not None:
+        ax.contour(
+            raster.x, raster.y, image, levels=levels, **(contour_kwargs or {})
+        )
+    if qx is not None and qy is not None:
+        plot_vectors(ax, raster, qx, qy, density=arrow_density)
+    ax.set_aspect('equal')
+    return ax, arr
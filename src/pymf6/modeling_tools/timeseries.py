@@ -0,0 +1,188 @@
+"""Time series of single cells from head or concentration files.
+
+MODFLOW 6 writes output time step by time step. Reading the time series of
+one cell therefore touches every record of the file. `CellTimeSeriesCache`
+builds a transposed (cell-major) copy of the file once. The history of a
+cell is then one contiguous read.
+
+The cache is a memory-mapped `.npy` file with one row per cell. Its
+number of columns grows by doubling, so appending time steps written by a
+running model only requires reading the new records.
+
+Usage example:
+
+>>> cache = CellTimeSeriesCache('model/model.hds')
+>>> cache.get_ts((0, 4, 4))
+>>> cache.refresh()  # after the model has written more steps
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from pymf6.modeling_tools.binary_output import BinaryOutputFile
+
+# Number of time steps transposed at once while building the cache.
+BUILD_CHUNK_STEPS = 256
+MIN_CAPACITY = 64
+
+
+class CellTimeSeriesCache:
+    """
+    Cell-major cache of a MODFLOW 6 head or concentration file.
+
+    `output_path` - path to the binary output file
+    `cache_path` - path of the cache without extension,
+                   defaults to the output path with suffix `.tcache`
+    `nlay` - number of layers, determined from the output file if not
+             given, see `BinaryOutputFile`
+
+    The default cache files end with `.tcache.npy`, `.tcache.json`, and
+    `.tcache.times.npy`. They are not treated as model input, i.e. they
+    change neither the run cache key nor the simulation cache.
+    """
+
+    def __init__(
+            self, output_path, cache_path=None, nlay=None, precision='double'):
+        self.output_path = Path(output_path)
+        if cache_path is None:
+            cache_path = self.output_path.with_name(
+                self.output_path.name + '.tcache'
+            )
+        self.cache_path = Path(cache_path)
+        self.data_path = self._cache_file('.npy')
+        self.meta_path = self._cache_file('.json')
+        self.times_path = self._cache_file('.times.npy')
+        self.output = BinaryOutputFile(
+            self.output_path, nlay=nlay, precision=precision
+        )
+        self.data = None
+        self.times = None
+        self.nsteps = 0
+        self._digest = None
+        self._open()
+        self.refresh()
+
+    def _cache_file(self, suffix):
+        return self.cache_path.with_name(self.cache_path.name + suffix)
+
+    @property
+    def shape(self):
+        """Grid shape as (nlay, nrow, ncol)."""
+        return self.output.shape
+
+    def _open(self):
+        """Open an existing cache if it matches the output file."""
+        if not (self.meta_path.exists() and self.data_path.exists()):
+            return
+        with open(self.meta_path, encoding='utf-8') as fobj:
+            meta = json.load(fobj)
+        size = self.output_path.stat().st_size
+        if (
+            tuple(meta['shape']) != self.shape
+            or meta['source_size'] > size
+        ):
+            return
+        self.data = np.load(self.data_path, mmap_mode='r+')
+        self.times = np.load(self.times_path)
+        self.nsteps = meta['nsteps']
+        self._digest = meta['digest']
+
+    def _last_step_digest(self):
+        """Hash of the last cached step as found in the output file."""
+        if self.nsteps == 0 or self.output.nsteps < self.nsteps:
+            return None
+        step = self.output.records[
+            (self.nsteps - 1) * self.output.nlay: self.nsteps * self.output.nlay
+        ]
+        return hashlib.blake2b(step.tobytes(), digest_size=16).hexdigest()
+
+    def _write_meta(self):
+        np.save(self.times_path, self.times)
+        self._digest = self._last_step_digest()
+        meta = {
+            'shape': self.shape,
+            'nsteps': self.nsteps,
+            'source_size': self.nsteps * self.output.nlay
+            * self.output.record_dtype.itemsize,
+            'digest': self._digest,
+        }
+        with open(self.meta_path, 'w', encoding='utf-8') as fobj:
+            json.dump(meta, fobj)
+
+    def _ensure_capacity(self, nsteps):
+        """Grow the cache file so that it holds at least `nsteps` steps."""
+        capacity = 0 if self.data is None else self.data.shape[1]
+        if nsteps <= capacity:
+            return
+        new_capacity = max(MIN_CAPACITY, capacity)
+        while new_capacity < nsteps:
+            new_capacity *= 2
+        tmp_path = self._cache_file('.tmp.npy')
+        new_data = np.lib.format.open_memmap(
+            tmp_path,
+            mode='w+',
+            dtype=self.output.record_dtype['data'].base,
+            shape=(self.output.ncells, new_capacity),
+        )
+        if self.nsteps:
+            new_data[:, : self.nsteps] = self.data[:, : self.nsteps]
+        new_data.flush()
+        del new_data
+        self.data = None
+        os.replace(tmp_path, self.data_path)
+        self.data = np.load(self.data_path, mmap_mode='r+')
+
+    def refresh(self):
+        """
+        Append time steps written since the last refresh.
+
+        Returns the number of new time steps.
+        """
+        self.output.refresh()
+        if self.nsteps and self._last_step_digest() != self._digest:
+            # The output file was written by a new run.
+            self.nsteps = 0
+        total = self.output.nsteps
+        start = self.nsteps
+        if total <= start:
+            return 0
+        self._ensure_capacity(total)
+        for chunk_start in range(start, total, BUILD_CHUNK_STEPS):
+            chunk_stop = min(chunk_start + BUILD_CHUNK_STEPS, total)
+            values = self.output.read_steps(chunk_start, chunk_stop)
+            self.data[:, chunk_start:chunk_stop] = values.reshape(
+                chunk_stop - chunk_start, -1
+            ).T
+        self.data.flush()
+        self.nsteps = total
+        self.times = self.output.times[:total]
+        self._write_meta()
+        return total - start
+
+    def _node_numbers(self, cells):
+        """Convert (layer, row, col) tuples into zero-based node numbers."""
+        cells = np.asarray(cells, dtype=int)
+        if cells.ndim == 1:
+            cells = cells[np.newaxis, :]
+        return np.ravel_multi_index(cells.T, self.shape)
+
+    def get_cell_values(self, cells):
+        """Values of all time steps with shape (number of cells, nsteps)."""
+        nodes = self._node_numbers(cells)
+        return np.asarray(self.data[nodes, : self.nsteps])
+
+    def get_ts(self, cells):
+        """
+        Time series in the layout of `flopy.utils.HeadFile.get_ts`.
+
+        `cells` - one (layer, row, col) tuple or a list of them
+
+        Returns an array with the times in the first column and the
+        values of each cell in the following columns.
+        """
+        values = self.get_cell_values(cells)
+        return np.column_stack([self.times, values.T])
@@ -0,0 +1,154 @@
+"""Extrapolated initial guess for new time steps.
+
+MF6 starts the outer iterations of a time step from the solution of the
+previous time step. For smoothly changing transient solutions, a better
+starting point is the extrapolation of the last converged solutions in
+time:
+
+* `linear` uses the last two solutions
+* `quadratic` uses the last three solutions
+
+Times are the simulation times at the end of the steps. Therefore,
+different time step lengths are taken into account, i.e. the change is
+scaled by the ratio of the new and the previous `delt`.
+
+Only cells with `IBOUND > 0` are changed, so constant-head (or
+constant-concentration) and inactive cells keep their values.
+The history is cleared at the start of a new stress period because the
+stresses change there.
+"""
+
+import numpy as np
+
+ORDERS = {'linear': 1, 'quadratic': 2}
+
+
+class Predictor:
+    """
+    Set X at the start of a time step by extrapolation.
+
+    `method` - `'linear'` or `'quadratic'`
+
+    Used by `Simulator` with `predictor='linear'` or
+    `predictor='quadratic'`.
+    """
+
+    def __init__(self, method='linear'):
+        if method not in ORDERS:
+            raise ValueError(
+                f'Unknown method {method}. Use one of {list(ORDERS)}.'
+            )
+        self.method = method
+        self.npoints = ORDERS[method] + 1
+        self._models = {}
+        # one entry per solved time step and solution:
+        # (solution id, outer iterations, predicted)
+        self._records = []
+
+    def _get_model(self, mf6, name):
+        """Pointers and history buffers of one model."""
+        model = self._models.get(name)
+        if model is None:
+            x = mf6.get_value_ptr(mf6.get_var_address('X', name.upper()))
+            ibound = mf6.get_value_ptr(
+                mf6.get_var_address('IBOUND', name.upper())
+            )
+            model = {
+                'x': x,
+                'active': ibound > 0,
+                'ibound': ibound,
+                'values': np.empty((self.npoints, x.size)),
+                'times': np.empty(self.npoints),
+                'count': 0,
+                'kper': None,
+            }
+            self._models[name] = model
+        return model
+
+    def _weights(self, times, time):
+        """Lagrange weights of the stored solutions at `time`."""
+        weights = np.ones(len(times))
+        for i, time_i in enumerate(times):
+            for j, time_j in enumerate(times):
+                if i != j:
+                    weights[i] *= (time - time_j) / (time_i - time_j)
+        return weights
+
+    def predict(self, mf6, sim_grp):
+        """
+        Set X of all models of the solution group to the extrapolation.
+
+        Must be called after `prepare_solve`, i.e. after MF6 has stored
+        the old solution, and before the first `solve`.
+        Returns `True` if X was changed.
+        """
+        time = mf6.get_current_time()
+        predicted = False
+        for name in sim_grp.model_names:
+            model = self._get_model(mf6, name)
+            if model['kper'] != sim_grp.kper:
+                model['count'] = 0
+                model['kper'] = sim_grp.kper
+            if model['count'] < self.npoints:
+                continue
+            # IBOUND may change, e.g. with BUY or cells that become dry.
+            np.greater(model['ibound'], 0, out=model['active'])
+            weights = self._weights(model['times'], time)
+            prediction = weights @ model['values']
+            active = model['active']
+            model['x'][active] = prediction[active]
+            predicted = True
+        return predicted
+
+    def store(
+            self, mf6, sim_grp, sol_id, iterations, predicted, has_converged):
+        """Store the converged solutions at the end of a time step."""
+        self._records.append((sol_id, iterations, predicted))
+        time = mf6.get_current_time()
+        for name in sim_grp.model_names:
+            model = self._get_model(mf6, name)
+            if not has_converged:
+                model['count'] = 0
+                continue
+            # shift history, oldest solution first
+            model['values'][:-1] = model['values'][1:]
+            model['times'][:-1] = model['times'][1:]
+            model['values'][-1] = model['x']
+            model['times'][-1] = time
+            model['count'] = min(model['count'] + 1, self.npoints)
+
+    def summary(self):
+        """
+        Outer iterations of steps with and without prediction.
+
+        Steps without prediction are the first steps of each stress
+        period, which usually need more iterations for other reasons.
+        Therefore, the means of both groups do not show the iterations
+        saved by the prediction. To measure them, run the simulation
+        once more without predictor and compare the iterations of the
+        time steps of both runs, i.e. the column `iterations` of
+        `MF6.solve_stats.to_dataframe()` or of `MF6.run_summary()`.
+        """
+        if not self._records:
+            return {}
+        records = np.array(
+            self._records,
+            dtype=[('solution', int), ('iterations', int), ('predicted', bool)],
+        )
+        with_prediction = records['iterations'][records['predicted']]
+        without_prediction = records['iterations'][~records['predicted']]
+        summary = {
+            'method': self.method,
+            'steps': len(records),
+            'predicted_steps': len(with_prediction),
+            'total_iterations': int(records['iterations'].sum()),
+            'mean_iterations_predicted': np.nan,
+            'mean_iterations_not_predicted': np.nan,
+        }
+        if with_prediction.size:
+            summary['mean_iterations_predicted'] = with_prediction.mean()
+        if without_prediction.size:
+            summary['mean_iterations_not_predicted'] = (
+                without_prediction.mean()
+            )
+        return summary
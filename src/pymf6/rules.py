@@ -0,0 +1,346 @@
+"""Declarative, vectorised rules for well control.
+
+Instead of writing `if head > upper: q *= 0.9` for each well, rules are
+declared per group of wells. All wells of a group are evaluated with NumPy
+array operations and the new rates are written directly into the `BOUND`
+array of the package in MF6 memory.
+
+A group has:
+
+* the wells, as cell ids such as `(layer, row, col)` or node numbers
+* the observed cells, defaults to the well cells
+* lower and upper head limits, scalars or one value per well
+* a mode: `'extraction'` reduces pumping if the head falls below the
+  lower limit, `'injection'` reduces injection if the head rises above the
+  upper limit
+* hysteresis: the rate is increased again only after a well was reduced
+  and the head is back beyond the other limit; the latch is cleared if
+  the well is back at its maximum rate or missing from the package
+* factors for decreasing and increasing the rates and a maximum rate,
+  which defaults to the first rate of each well in the input files
+* optional paired wells, e.g. injection wells that get the negative rate
+  of the corresponding extraction wells
+
+Usage example:
+
+>>> engine = RuleEngine()
+>>> engine.add_group(
+...     'out', model='gwf', package='wel_0', wells=[(0, 20, 60)],
+...     lower=9.48, upper=9.5, mode='extraction',
+...     paired_wells=[(0, 20, 20)], stress_periods=[2],
+... )
+>>> for model_step in mf6.model_loop():
+...     engine(model_step)
+"""
+
+import numpy as np
+from xmipy.errors import InputError, XMIError
+
+from .api import States
+
+MODES = ('extraction', 'injection')
+# Dimensions of the discretization packages, in the order of cell ids.
+DIS_DIMENSIONS = {
+    'DIS': ('NLAY', 'NROW', 'NCOL'),
+    'DISV': ('NLAY', 'NCPL'),
+    'DISU': ('NODESUSER',),
+}
+
+
+def get_grid_shape(mf6, model_name):
+    """Name of the discretization package and shape of the user grid."""
+    model_name = model_name.upper()
+    for dis, dimensions in DIS_DIMENSIONS.items():
+        try:
+            shape = tuple(
+                int(mf6.get_value_ptr(f'{model_name}/{dis}/{dim}')[0])
+                for dim in dimensions
+            )
+        except (InputError, XMIError):
+            continue
+        return dis, shape
+    raise ValueError(f'No discretization package found for {model_name}.')
+
+
+def cells_to_nodes(mf6, model_name, cells):
+    """
+    Zero-based reduced node numbers, i.e. indices into X, of cells.
+
+    `cells` - cell ids such as `(layer, row, col)` or zero-based user node
+              numbers
+    """
+    model_name = model_name.upper()
+    dis, shape = get_grid_shape(mf6, model_name)
+    cells = np.asarray(cells)
+    if cells.ndim == 2:
+        nodes = np.ravel_multi_index(tuple(cells.T), shape)
+    else:
+        nodes = cells.astype(np.int64)
+    reduced = mf6.get_value_ptr(f'{model_name}/{dis}/NODEREDUCED')
+    if reduced.size:
+        nodes = reduced[nodes] - 1
+        if (nodes < 0).any():
+            raise ValueError(f'Inactive cells: {cells[nodes < 0].tolist()}')
+    return nodes
+
+
+class BoundaryBinding:
+    """
+    Zero-copy access to rows of a boundary package in MF6 memory.
+
+    `model` - name of the model
+    `package` - name of the package, e.g. `'wel_0'`
+    `cells` - cell ids or zero-based user node numbers of the wanted rows
+    `column` - column of `BOUND`, e.g. 0 for the rate of WEL
+
+    `rows` are the rows of the cells in `BOUND`, -1 if a cell is not in
+    the package in the current stress period. `refresh` must be called
+    when the stress period changes because the rows may change.
+    """
+
+    def __init__(self, model, package, cells, column=0):
+        self.model = model.upper()
+        self.package = package.upper()
+        self.cells = cells
+        self.column = column
+        self.mf6 = None
+        self.nodes = None
+        self.rows = None
+        self.found = None
+        self.bound = None
+        self.kper = None
+
+    def _address(self, name):
+        return f'{self.model}/{self.package}/{name}'
+
+    def refresh(self, mf6, kper=None):
+        """Get the pointers and find the rows of the cells."""
+        if self.mf6 is not mf6:
+            self.mf6 = mf6
+            self.nodes = cells_to_nodes(mf6, self.model, self.cells)
+        self.kper = kper
+        self.bound = mf6.get_value_ptr(self._address('BOUND'))
+        nbound = mf6.get_value_ptr(self._address('NBOUND'))[0]
+        nodelist = mf6.get_value_ptr(self._address('NODELIST'))[:nbound] - 1
+        order = np.argsort(nodelist, kind='stable')
+        pos = np.searchsorted(nodelist[order], self.nodes)
+        pos = np.minimum(pos, max(nbound - 1, 0))
+        rows = order[pos] if nbound else np.zeros_like(self.nodes)
+        self.found = (
+            (nodelist[rows] == self.nodes) if nbound
+            else np.zeros(self.nodes.shape, dtype=bool)
+        )
+        self.rows = np.where(self.found, rows, -1)
+
+    def update(self, model_step):
+        """Refresh if the stress period of `model_step` is new."""
+        sim_grp = model_step.simulation_group
+        if self.bound is None or sim_grp.kper != self.kper:
+            self.refresh(sim_grp.mf6, sim_grp.kper)
+
+    def get(self):
+        """Values of the column, NaN for cells not in the package."""
+        values = np.full(self.rows.shape, np.nan)
+        values[self.found] = self.bound[self.rows[self.found], self.column]
+        return values
+
+    def set(self, values, mask=None):
+        """Write values of the found cells into `BOUND`.
+
+        `mask` - only write the values where `mask` is true
+        """
+        values = np.broadcast_to(values, self.rows.shape)
+        found = self.found if mask is None else self.found & mask
+        self.bound[self.rows[found], self.column] = values[found]
+
+
+class WellGroup:
+    """
+    Wells of a boundary package and the cells observed to control them.
+
+    `model` - name of the model with the package
+    `package` - name of the package, e.g. `'wel_0'`
+    `wells` - cell ids or zero-based user node numbers of the wells
+    `observed` - cells to observe, defaults to `wells`
+    `observed_model` - model to observe, defaults to `model`
+    `stress_periods` - zero-based stress periods to control, defaults to all
+    `column` - column of `BOUND` with the rates
+
+    Base class of the rule groups and the feedback controllers.
+    """
+
+    def __init__(
+            self, model, package, wells, observed=None, observed_model=None,
+            stress_periods=None, column=0):
+        self.binding = BoundaryBinding(model, package, wells, column)
+        self.observed_model = (observed_model or model).upper()
+        self.observed_cells = wells if observed is None else observed
+        self.nwells = len(wells)
+        self.stress_periods = (
+            None if stress_periods is None else set(stress_periods)
+        )
+        self.x = None
+        self.observed = None
+
+    def bind(self, model_step):
+        """
+        Update the pointers for `model_step`.
+
+        Returns `False` if the stress period is not controlled.
+        """
+        sim_grp = model_step.simulation_group
+        if (
+            self.stress_periods is not None
+            and sim_grp.kper not in self.stress_periods
+        ):
+            return False
+        mf6 = sim_grp.mf6
+        if self.x is None or self.binding.mf6 is not mf6:
+            self.x = mf6.get_value_ptr(f'{self.observed_model}/X')
+            self.observed = cells_to_nodes(
+                mf6, self.observed_model, self.observed_cells
+            )
+        self.binding.update(model_step)
+        return True
+
+
+class RuleGroup(WellGroup):
+    """
+    Threshold rules for a group of wells.
+
+    See `RuleEngine.add_group` for the arguments.
+    """
+
+    def __init__(
+            self,
+            name,
+            model,
+            package,
+            wells,
+            lower,
+            upper,
+            observed=None,
+            mode='extraction',
+            decrease=0.9,
+            increase=1.1,
+            max_rate=None,
+            paired_wells=None,
+            paired_package=None,
+            pair_ratio=1.0,
+            stress_periods=None,
+            column=0):
+        if mode not in MODES:
+            raise ValueError(f'Unknown mode {mode}. Use one of {MODES}.')
+        super().__init__(
+            model, package, wells, observed=observed,
+            stress_periods=stress_periods, column=column,
+        )
+        self.name = name
+        self.model = model.upper()
+        self.mode = mode
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        if (self.lower > self.upper).any():
+            raise ValueError('Lower limits must not be above upper limits.')
+        self.decrease = decrease
+        self.increase = increase
+        self.max_rate = np.full(self.nwells, np.nan)
+        if max_rate is not None:
+            self.max_rate[:] = np.abs(np.asarray(max_rate, dtype=np.float64))
+        self.pair = None
+        if paired_wells is not None:
+            self.pair = BoundaryBinding(
+                model, paired_package or package, paired_wells, column
+            )
+        self.pair_ratio = pair_ratio
+        self.latched = np.zeros(self.nwells, dtype=bool)
+
+    def apply(self, model_step):
+        """Evaluate the rules and write the new rates."""
+        if not self.bind(model_step):
+            return
+        rates = self.binding.get()
+        # Wells may be missing from the package in the first stress
+        # periods. Use the first rate read for each well.
+        unset = np.isnan(self.max_rate) & ~np.isnan(rates)
+        self.max_rate[unset] = np.abs(rates[unset])
+        head = self.x[self.observed]
+        if self.mode == 'extraction':
+            violated = head < self.lower
+            recovered = self.latched & (head > self.upper)
+        else:
+            violated = head > self.upper
+            recovered = self.latched & (head < self.lower)
+        self.latched |= violated
+        factor = np.where(
+            violated, self.decrease, np.where(recovered, self.increase, 1.0)
+        )
+        rates = rates * factor
+        rates = np.sign(rates) * np.minimum(np.abs(rates), self.max_rate)
+        # Wells back at the maximum rate and wells missing from the
+        # package start over.
+        self.latched &= ~(
+            (recovered & (np.abs(rates) >= self.max_rate)) | np.isnan(rates)
+        )
+        self.binding.set(rates)
+        if self.pair is not None:
+            self.pair.update(model_step)
+            # Wells missing from the package do not change their pair.
+            self.pair.set(-self.pair_ratio * rates, mask=~np.isnan(rates))
+
+
+class RuleEngine:
+    """
+    Apply rule groups to a running simulation.
+
+    An instance is a controller, i.e. it is called with a `ModelStep`.
+    `states` - states the rules are evaluated in
+    """
+
+    def __init__(self, states=(States.timestep_start,)):
+        self.states = states
+        self.groups = {}
+
+    def add_group(self, name, model, package, wells, lower, upper, **kwargs):
+        """
+        Add a group of wells with the same rules.
+
+        `name` - unique name of the group
+        `model` - name of the model
+        `package` - name of the well package, e.g. `'wel_0'`
+        `wells` - cell ids or zero-based user node numbers of the wells
+        `lower`, `upper` - head limits, scalars or one value per well
+        `observed` - cells to observe the head in, defaults to `wells`
+        `mode` - `'extraction'` or `'injection'`
+        `decrease`, `increase` - factors for the rates
+        `max_rate` - maximum absolute rate, defaults to the first rate
+                     read for each well
+        `paired_wells` - cells of wells with the negative rates of `wells`
+        `paired_package` - package of the paired wells, defaults to
+                           `package`
+        `pair_ratio` - paired rate = -`pair_ratio` * rate
+        `stress_periods` - zero-based stress periods to apply the rules in,
+                           defaults to all
+        `column` - column of `BOUND` with the rates
+        """
+        if name in self.groups:
+            raise ValueError(f'Group {name} already exists.')
+        group = RuleGroup(name, model, package, wells, lower, upper, **kwargs)
+        self.groups[name] = group
+        return group
+
+    def __call__(self, model_step):
+        if model_step.state not in self.states:
+            return
+        model_names = {
+            name.upper() for name in model_step.simulation_group.model_names
+        }
+        for group in self.groups.values():
+            if group.model in model_names:
+                group.apply(model_step)
+
+    def latched(self):
+        """Wells that were reduced at least once, by group."""
+        return {
+            name: group.latched.copy() for name, group in self.groups.items()
+        }
@@ -0,0 +1,238 @@
+"""Cache of complete simulation runs.
+
+A run is identified by the content of its input files, the MODFLOW 6
+version, and a fingerprint of the controller code provided by the user.
+If a run with the same key was stored before, its outputs are copied into
+the simulation directory and its final state is returned instead of
+running MF6 again.
+
+Each entry is a directory named after the key. Entries are written into a
+temporary directory first and renamed, so several processes can share one
+cache directory. If the cache grows beyond `max_bytes`, the least recently
+used entries are removed.
+
+Usage example:
+
+>>> cache = RunCache('~/.pymf6_run_cache')
+>>> key = cache.make_key('models/base', mf6_version, fingerprint='v1')
+>>> final_state = cache.get(key, 'models/base')
+>>> if final_state is None:
+...     final_state = run(...)
+...     cache.put(key, 'models/base', final_state)
+"""
+
+from contextlib import contextmanager
+import hashlib
+import inspect
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from .workspace import is_input_file, is_output_file
+
+META_NAME = 'meta.json'
+STATE_NAME = 'final_state.npz'
+OUTPUT_DIR = 'outputs'
+STATS_NAME = 'stats.json'
+LOCK_NAME = 'stats.lock'
+# Read input files in blocks of this size for hashing.
+HASH_BLOCK_SIZE = 1024**2
+
+
+def hash_file(path):
+    """SHA-256 hash of the content of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fobj:
+        while block := fobj.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on the file `path` between processes."""
+    with open(path, 'a+b') as fobj:
+        if os.name == 'nt':
+            import msvcrt  # pylint: disable=import-outside-toplevel
+
+            fobj.seek(0)
+            msvcrt.locking(fobj.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                fobj.seek(0)
+                msvcrt.locking(fobj.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl  # pylint: disable=import-outside-toplevel
+
+            fcntl.flock(fobj.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fobj.fileno(), fcntl.LOCK_UN)
+
+
+def make_fingerprint(*controllers):
+    """
+    Fingerprint of controller code.
+
+    Uses the source code of functions, classes, or modules. For other
+    objects, e.g. instances with parameters, their `repr` is used.
+    """
+    digest = hashlib.sha256()
+    for controller in controllers:
+        try:
+            source = inspect.getsource(controller)
+        except (OSError, TypeError):
+            source = repr(controller)
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RunCache:
+    """
+    Content-addressed cache of simulation runs.
+
+    `cache_dir` - directory of the cache, created if it does not exist
+    `max_bytes` - maximum size of all entries
+    """
+
+    def __init__(self, cache_dir, max_bytes=10 * 1024**3):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    @staticmethod
+    def make_key(sim_path, mf6_version, fingerprint=''):
+        """
+        Make the key of a run.
+
+        `sim_path` - simulation directory, all files except MF6 outputs
+                     and pymf6 caches are hashed
+        `mf6_version` - version of the MF6 shared library
+        `fingerprint` - string identifying the controller code
+        """
+        sim_path = Path(sim_path)
+        digest = hashlib.sha256()
+        digest.update(f'mf6 {mf6_version}\n'.encode('utf-8'))
+        digest.update(f'controller {fingerprint}\n'.encode('utf-8'))
+        for path in sorted(sim_path.rglob('*')):
+            if path.is_file() and is_input_file(path):
+                name = path.relative_to(sim_path).as_posix()
+                digest.update(f'{name} {hash_file(path)}\n'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _update_stats(self, name):
+        """Count an event for this instance and in the shared stats file."""
+        self.stats[name] += 1
+        path = self.cache_dir / STATS_NAME
+        # Other processes must not update the file between read and write.
+        with file_lock(self.cache_dir / LOCK_NAME):
+            stats = {}
+            if path.exists():
+                try:
+                    stats = json.loads(path.read_text(encoding='utf-8'))
+                except ValueError:
+                    pass
+            stats[name] = stats.get(name, 0) + 1
+            tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+            tmp_path.write_text(json.dumps(stats), encoding='utf-8')
+            os.replace(tmp_path, path)
+
+    @property
+    def total_stats(self):
+        """Statistics of all processes that used the cache directory."""
+        path = self.cache_dir / STATS_NAME
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text(encoding='utf-8'))
+
+    def get(self, key, sim_path):
+        """
+        Copy the outputs of a stored run into `sim_path`.
+
+        Returns the final state as dict of arrays, or `None` if there is no
+        stored run for `key`.
+        """
+        entry = self.cache_dir / key
+        if not (entry / META_NAME).exists():
+            self._update_stats('misses')
+            return None
+        shutil.copytree(entry / OUTPUT_DIR, sim_path, dirs_exist_ok=True)
+        with np.load(entry / STATE_NAME) as npz:
+            final_state = dict(npz)
+        # The modification time of the meta file marks the last use.
+        os.utime(entry / META_NAME)
+        self._update_stats('hits')
+        return final_state
+
+    def put(self, key, sim_path, final_state=None):
+        """
+        Store the outputs in `sim_path` and the final state of a run.
+
+        `final_state` - dict of arrays, e.g. the heads of all models
+        """
+        sim_path = Path(sim_path)
+        entry = self.cache_dir / key
+        if entry.exists():
+            return
+        tmp_entry = Path(tempfile.mkdtemp(prefix='tmp_', dir=self.cache_dir))
+        size = 0
+        for path in sim_path.rglob('*'):
+            if path.is_file() and is_output_file(path):
+                dst = tmp_entry / OUTPUT_DIR / path.relative_to(sim_path)
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(path, dst)
+                size += path.stat().st_size
+        (tmp_entry / OUTPUT_DIR).mkdir(exist_ok=True)
+        np.savez(tmp_entry / STATE_NAME, **(final_state or {}))
+        size += (tmp_entry / STATE_NAME).stat().st_size
+        meta = {'key': key, 'size': size, 'created': time.time()}
+        (tmp_entry / META_NAME).write_text(json.dumps(meta), encoding='utf-8')
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # Another process stored the same run in the meantime.
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        self._update_stats('stores')
+        self.evict()
+
+    def entries(self):
+        """Size and time of last use of all entries, least recent first."""
+        entries = []
+        for meta_path in self.cache_dir.glob(f'*/{META_NAME}'):
+            try:
+                meta = json.loads(meta_path.read_text(encoding='utf-8'))
+                last_used = meta_path.stat().st_mtime
+            except (OSError, ValueError):
+                continue
+            entries.append((last_used, meta['size'], meta_path.parent))
+        return sorted(entries)
+
+    @property
+    def size(self):
+        """Size of all entries in bytes."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self._update_stats('evictions')
+
+    def clear(self):
+        """Remove all entries."""
+        for _, _, path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
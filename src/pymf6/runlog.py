@@ -0,0 +1,198 @@
+"""Structured run log and metrics file.
+
+`RunLog` writes events as JSON lines, one object per line. Events are put
+into a queue and serialized and written by a background thread, so the
+simulation loop does not wait for the disk.
+
+Optionally, the thread writes a snapshot of the run metrics in the
+Prometheus text exposition format every `metrics_interval` seconds. The
+file is replaced atomically, so it can be read by the textfile collector
+of a node exporter at any time.
+
+Usage example:
+
+>>> with RunLog('run.jsonl', metrics_path='pymf6.prom') as run_log:
+...     mf6 = MF6('path/to/sim', run_log=run_log)
+...     for model_step in mf6.model_loop():
+...         pass
+"""
+
+import json
+import os
+from pathlib import Path
+from queue import Empty, SimpleQueue
+from threading import Thread
+import time
+
+import numpy as np
+
+# Metric name: (type, help text)
+METRICS = {
+    'pymf6_time_steps_total': ('counter', 'Finished time steps.'),
+    'pymf6_outer_iterations_total': ('counter', 'Outer iterations.'),
+    'pymf6_not_converged_total': (
+        'counter', 'Solutions of time steps that did not converge.'
+    ),
+    'pymf6_solve_seconds_total': ('counter', 'Wall time in solve.'),
+    'pymf6_user_seconds_total': (
+        'counter', 'Wall time in user code between the steps.'
+    ),
+    'pymf6_simulation_time': ('gauge', 'Current simulation time.'),
+    'pymf6_end_time': ('gauge', 'End time of the simulation.'),
+    'pymf6_stress_period': ('gauge', 'Current stress period, zero-based.'),
+    'pymf6_running': ('gauge', '1 while the simulation is running.'),
+}
+# Write buffer size of the log file in bytes.
+BUFFER_SIZE = 64 * 1024
+
+
+def _to_json(value):
+    """Convert NumPy values for `json.dumps`."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text format."""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+class RunLog:
+    """
+    Event log in JSON lines format with asynchronous writes.
+
+    `path` - JSON lines file, appended if it exists
+    `metrics_path` - Prometheus text file, `None` for no metrics file
+    `metrics_interval` - seconds between two writes of the metrics file
+    `simulation` - name of the simulation, added to all events and metrics
+    """
+
+    def __init__(
+            self,
+            path,
+            metrics_path=None,
+            metrics_interval=10.0,
+            simulation=''):
+        self.path = Path(path)
+        self.metrics_path = None if metrics_path is None else Path(
+            metrics_path
+        )
+        self.metrics_interval = metrics_interval
+        self.simulation = simulation
+        self.metrics = {name: 0 for name in METRICS}
+        self._queue = SimpleQueue()
+        self._closed = False
+        self._thread = Thread(target=self._write, name='pymf6-run-log')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def event(self, event, **fields):
+        """Add an event with arbitrary JSON-serializable fields."""
+        if self._closed:
+            raise ValueError(f'Run log {self.path} is closed.')
+        record = {
+            'time': time.time(),
+            'event': event,
+            'simulation': self.simulation,
+        }
+        record.update(fields)
+        self._queue.put(record)
+
+    def log_step(self, stats):
+        """Add the current time step of a `SolveStats` and update metrics."""
+        step = stats.step
+        iterations = stats.iterations[step]
+        converged = stats.converged[step]
+        solve_time = stats.solve_time[step]
+        user_time = stats.user_time[step]
+        # Copies, the arrays may be reallocated before the thread writes.
+        self.event(
+            'timestep',
+            step=step,
+            kper=stats.kper[step],
+            kstp=stats.kstp[step],
+            totim=stats.totim[step],
+            iterations=iterations.copy(),
+            converged=converged.copy(),
+            solve_time=solve_time.copy(),
+            user_time=user_time.copy(),
+            max_change=stats.max_change[step].copy(),
+        )
+        metrics = self.metrics
+        metrics['pymf6_time_steps_total'] += 1
+        metrics['pymf6_outer_iterations_total'] += int(
+            iterations[iterations > 0].sum()
+        )
+        metrics['pymf6_not_converged_total'] += int(
+            (~converged & (iterations >= 0)).sum()
+        )
+        metrics['pymf6_solve_seconds_total'] += float(solve_time.sum())
+        metrics['pymf6_user_seconds_total'] += float(user_time.sum())
+        metrics['pymf6_simulation_time'] = float(stats.totim[step])
+        metrics['pymf6_stress_period'] = int(stats.kper[step])
+
+    def _write(self):
+        last_metrics = 0.0
+        with open(
+                self.path, 'a', encoding='utf-8', buffering=BUFFER_SIZE
+        ) as fobj:
+            while True:
+                try:
+                    record = self._queue.get(timeout=self.metrics_interval)
+                except Empty:
+                    record = False
+                if record is None:
+                    break
+                if record:
+                    fobj.write(json.dumps(record, default=_to_json) + '\n')
+                now = time.monotonic()
+                if (
+                    self.metrics_path is not None
+                    and now - last_metrics >= self.metrics_interval
+                ):
+                    fobj.flush()
+                    self.write_metrics()
+                    last_metrics = now
+        if self.metrics_path is not None:
+            self.write_metrics()
+
+    def format_metrics(self):
+        """Metrics in the Prometheus text exposition format."""
+        labels = f'{{simulation="{escape_label(self.simulation)}"}}'
+        lines = []
+        for name, value in dict(self.metrics).items():
+            metric_type, help_text = METRICS[name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics(self):
+        """Replace the metrics file atomically."""
+        tmp_path = self.metrics_path.with_name(
+            f'.{self.metrics_path.name}.{os.getpid()}.tmp'
+        )
+        tmp_path.write_text(self.format_metrics(), encoding='utf-8')
+        os.replace(tmp_path, self.metrics_path)
+
+    def close(self):
+        """Write all pending events and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,189 @@
+"""Timeline of a simulation run in Chrome trace-event format.
+
+A `Tracer` records the duration of the MF6 phases of `Simulator.loop`:
+
+* `prepare_time_step`, `do_time_step`, and `finalize_time_step`
+* `prepare_solve`, `solve`, and `finalize_solve`, with the solution id
+* the user code between the yields of the loop, named after the state
+
+Events are stored in a preallocated NumPy ring buffer. If the buffer is
+full, the oldest events are overwritten. The events are written as JSON at
+the end of the run. The file can be opened with `chrome://tracing` or
+https://ui.perfetto.dev.
+
+Without a tracer, the loop is not wrapped at all, i.e. there is no
+overhead.
+
+Usage example:
+
+>>> mf6 = MF6('path/to/sim', tracer=Tracer('trace.json'))
+>>> for model_step in mf6.model_loop():
+...     pass
+"""
+
+import json
+import os
+from pathlib import Path
+from time import perf_counter_ns
+
+import numpy as np
+
+# Default number of events in the ring buffer.
+CAPACITY = 2**20
+EVENT_DTYPE = np.dtype([
+    ('name', np.int32),
+    ('category', np.int8),
+    ('start', np.int64),
+    ('duration', np.int64),
+    ('arg', np.int32),
+])
+CATEGORIES = ('mf6', 'user')
+# MF6 API methods called by `Simulator.loop`.
+TRACED_METHODS = (
+    'prepare_time_step',
+    'do_time_step',
+    'prepare_solve',
+    'solve',
+    'finalize_solve',
+    'finalize_time_step',
+    'finalize',
+)
+
+
+class Tracer:
+    """
+    Record events of a simulation run in a ring buffer.
+
+    `path` - JSON file written at the end of the run, `None` for no file
+    `capacity` - maximum number of events kept in memory
+    """
+
+    def __init__(self, path=None, capacity=CAPACITY):
+        self.path = None if path is None else Path(path)
+        self.capacity = capacity
+        self.events = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.count = 0
+        self.names = []
+        self._name_ids = {}
+        self._origin = perf_counter_ns()
+
+    def name_id(self, name):
+        """Integer id of an event name."""
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(name)
+            self._name_ids[name] = name_id
+        return name_id
+
+    def record(self, name_id, category, start, end, arg=-1):
+        """Store one event, times in nanoseconds from `perf_counter_ns`."""
+        event = self.events[self.count % self.capacity]
+        event['name'] = name_id
+        event['category'] = category
+        event['start'] = start - self._origin
+        event['duration'] = end - start
+        event['arg'] = arg
+        self.count += 1
+
+    @property
+    def dropped(self):
+        """Number of overwritten events."""
+        return max(self.count - self.capacity, 0)
+
+    def get_events(self):
+        """Recorded events in chronological order."""
+        if self.count <= self.capacity:
+            return self.events[:self.count]
+        index = self.count % self.capacity
+        return np.concatenate([self.events[index:], self.events[:index]])
+
+    def wrap(self, func, name):
+        """Wrap an MF6 API function to record each call."""
+        name_id = self.name_id(name)
+        category = CATEGORIES.index('mf6')
+        record = self.record
+
+        def traced(*args):
+            start = perf_counter_ns()
+            result = func(*args)
+            arg = args[0] if args and isinstance(args[0], int) else -1
+            record(name_id, category, start, perf_counter_ns(), arg)
+            return result
+
+        traced.__name__ = name
+        traced.__doc__ = func.__doc__
+        return traced
+
+    def trace_loop(self, loop):
+        """
+        Record the time spent outside of `loop`, i.e. in user code.
+
+        Writes the file at the end of the loop.
+        """
+        category = CATEGORIES.index('user')
+        name_ids = {}
+        try:
+            for sim_grp, state in loop:
+                name_id = name_ids.get(state.name)
+                if name_id is None:
+                    name_id = self.name_id(f'user {state.name}')
+                    name_ids[state.name] = name_id
+                start = perf_counter_ns()
+                yield sim_grp, state
+                self.record(name_id, category, start, perf_counter_ns())
+        finally:
+            if self.path is not None:
+                self.write()
+
+    def to_trace_events(self):
+        """Events as list of dicts in Chrome trace-event format."""
+        pid = os.getpid()
+        trace_events = [{
+            'name': 'process_name',
+            'ph': 'M',
+            'pid': pid,
+            'args': {'name': 'pymf6'},
+        }]
+        for event in self.get_events():
+            trace_event = {
+                'name': self.names[event['name']],
+                'cat': CATEGORIES[event['category']],
+                'ph': 'X',
+                'ts': event['start'] / 1e3,
+                'dur': event['duration'] / 1e3,
+                'pid': pid,
+                'tid': 0,
+            }
+            if event['arg'] >= 0:
+                trace_event['args'] = {'solution': int(event['arg'])}
+            trace_events.append(trace_event)
+        return trace_events
+
+    def write(self, path=None):
+        """Write all events as JSON file."""
+        path = self.path if path is None else Path(path)
+        trace = {
+            'traceEvents': self.to_trace_events(),
+            'displayTimeUnit': 'ms',
+            'otherData': {'dropped_events': self.dropped},
+        }
+        with open(path, 'w', encoding='utf-8') as fobj:
+            json.dump(trace, fobj)
+        return path
+
+
+class TracedApi:
+    """
+    MF6 API object that records the calls of `TRACED_METHODS`.
+
+    All other attributes are taken from `mf6`.
+    """
+
+    def __init__(self, mf6, tracer):
+        self._mf6 = mf6
+        for name in TRACED_METHODS:
+            setattr(self, name, tracer.wrap(getattr(mf6, name), name))
+
+    def __getattr__(self, name):
+        return getattr(self._mf6, name)
@@ -0,0 +1,237 @@
+"""Watchpoints that call Python code only if a threshold is crossed.
+
+A watchpoint observes values of a runtime variable at given indices:
+
+* `'X'` - heads or concentrations of cells of a model
+* `'SIMVALS'` - simulated flows of a boundary package, e.g. of wells
+* `'BOUND'` - a column of the stress period data of a boundary package
+
+For each check, the values of all watchpoints are gathered into one
+buffer and compared with all thresholds at once. The callback of a
+watchpoint is called only if at least one of its values crossed the
+threshold since the last check.
+
+Usage example:
+
+>>> def alarm(crossing):
+...     print(crossing.time, crossing.cells, crossing.direction)
+>>> watchpoints = Watchpoints()
+>>> watchpoints.watch(
+...     'low_head', model='gwf', cells=[(0, 4, 4), (0, 5, 5)],
+...     threshold=0.5, callback=alarm, direction='down',
+... )
+>>> for model_step in mf6.model_loop():
+...     watchpoints(model_step)
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .api import States
+from .rules import BoundaryBinding, cells_to_nodes
+
+VARIABLES = ('X', 'SIMVALS', 'BOUND')
+# Sign of the crossings to report.
+DIRECTIONS = {'up': 1, 'down': -1, 'both': 0}
+
+Crossing = namedtuple(
+    'Crossing',
+    ['name', 'cells', 'indices', 'direction', 'values', 'time', 'kper',
+     'kstp'],
+)
+Crossing.__doc__ = """
+Threshold crossings of one watchpoint.
+
+`cells` - crossed cells as given to `Watchpoints.watch`
+`indices` - positions of the crossed cells in the watched cells
+`direction` - 1 for upward and -1 for downward crossings
+`values` - current values of the crossed cells
+"""
+
+
+class Watchpoint:
+    """
+    Values of one variable to compare with thresholds.
+
+    See `Watchpoints.watch` for the arguments.
+    """
+
+    def __init__(
+            self, name, model, cells, threshold, callback, variable='X',
+            package=None, column=0, direction='both'):
+        if variable not in VARIABLES:
+            raise ValueError(
+                f'Unknown variable {variable}. Use one of {VARIABLES}.'
+            )
+        if variable != 'X' and package is None:
+            raise ValueError(f'Variable {variable} needs a `package`.')
+        if direction not in DIRECTIONS:
+            raise ValueError(
+                f'Unknown direction {direction}. '
+                f'Use one of {list(DIRECTIONS)}.'
+            )
+        self.name = name
+        self.model = model.upper()
+        self.cells = cells
+        self.size = len(cells)
+        self.threshold = np.broadcast_to(
+            np.asarray(threshold, dtype=np.float64), self.size
+        )
+        self.callback = callback
+        self.variable = variable
+        self.direction = DIRECTIONS[direction]
+        self.binding = None
+        if variable != 'X':
+            self.binding = BoundaryBinding(
+                model, package, cells, 0 if variable == 'SIMVALS' else column
+            )
+        self.mf6 = None
+        self.array = None
+        self.index = None
+        self.valid = None
+
+    def bind(self, model_step):
+        """Get the pointer and indices, again for new stress periods."""
+        sim_grp = model_step.simulation_group
+        mf6 = sim_grp.mf6
+        if self.binding is None:
+            if self.mf6 is not mf6:
+                self.mf6 = mf6
+                self.array = mf6.get_value_ptr(f'{self.model}/X')
+                self.index = cells_to_nodes(mf6, self.model, self.cells)
+                self.valid = np.ones(self.size, dtype=bool)
+            return
+        kper = self.binding.kper
+        self.binding.update(model_step)
+        if self.mf6 is mf6 and kper == self.binding.kper:
+            return
+        self.mf6 = mf6
+        binding = self.binding
+        if self.variable == 'SIMVALS':
+            self.array = mf6.get_value_ptr(
+                f'{binding.model}/{binding.package}/SIMVALS'
+            )
+            flat_index = binding.rows
+        else:
+            self.array = binding.bound.reshape(-1)
+            flat_index = binding.rows * binding.bound.shape[1] + (
+                binding.column
+            )
+        self.valid = binding.found.copy()
+        self.index = np.where(self.valid, flat_index, 0)
+
+
+class Watchpoints:
+    """
+    Check thresholds of many watchpoints with one comparison.
+
+    An instance is a controller, i.e. it is called with a `ModelStep`.
+    `states` - states to check the thresholds in
+    """
+
+    def __init__(self, states=(States.timestep_end,)):
+        self.states = states
+        self.watchpoints = {}
+        self.checks = 0
+        self._buffer = None
+        self._previous = None
+        self._offsets = None
+        self._threshold = None
+        self._direction = None
+
+    def watch(
+            self, name, model, cells, threshold, callback, variable='X',
+            package=None, column=0, direction='both'):
+        """
+        Add a watchpoint.
+
+        `name` - unique name
+        `model` - name of the model
+        `cells` - cell ids or zero-based user node numbers
+        `threshold` - scalar or one value per cell
+        `callback` - called with a `Crossing` if values crossed
+        `variable` - `'X'`, `'SIMVALS'`, or `'BOUND'`
+        `package` - boundary package for `'SIMVALS'` and `'BOUND'`
+        `column` - column of `'BOUND'`
+        `direction` - report crossings `'up'`, `'down'`, or `'both'`
+        """
+        if name in self.watchpoints:
+            raise ValueError(f'Watchpoint {name} already exists.')
+        self.watchpoints[name] = Watchpoint(
+            name, model, cells, threshold, callback, variable=variable,
+            package=package, column=column, direction=direction,
+        )
+        self._buffer = None
+
+    def remove(self, name):
+        """Remove a watchpoint."""
+        del self.watchpoints[name]
+        self._buffer = None
+
+    def _allocate(self):
+        sizes = [watchpoint.size for watchpoint in self.watchpoints.values()]
+        self._offsets = np.concatenate([[0], np.cumsum(sizes)])
+        total = self._offsets[-1]
+        self._buffer = np.empty(total)
+        self._previous = np.full(total, np.nan)
+        self._threshold = np.concatenate(
+            [watchpoint.threshold for watchpoint in self.watchpoints.values()]
+        ) if self.watchpoints else np.empty(0)
+        self._direction = np.concatenate([
+            np.full(watchpoint.size, watchpoint.direction)
+            for watchpoint in self.watchpoints.values()
+        ]) if self.watchpoints else np.empty(0)
+
+    def __call__(self, model_step):
+        if model_step.state not in self.states:
+            return
+        if self._buffer is None:
+            self._allocate()
+        buffer = self._buffer
+        model_names = {
+            name.upper() for name in model_step.simulation_group.model_names
+        }
+        offsets = self._offsets
+        # Keep the values of watchpoints of other solution groups.
+        buffer[:] = self._previous
+        for pos, watchpoint in enumerate(self.watchpoints.values()):
+            if watchpoint.model not in model_names:
+                continue
+            watchpoint.bind(model_step)
+            part = buffer[offsets[pos]:offsets[pos + 1]]
+            np.take(watchpoint.array, watchpoint.index, out=part)
+            part[~watchpoint.valid] = np.nan
+        self.checks += 1
+        with np.errstate(invalid='ignore'):
+            above = buffer > self._threshold
+            was_above = self._previous > self._threshold
+        known = ~(np.isnan(buffer) | np.isnan(self._previous))
+        crossed = known & (above != was_above)
+        direction = np.where(above, 1, -1)
+        crossed &= (self._direction == 0) | (self._direction == direction)
+        self._previous[:] = buffer
+        if not crossed.any():
+            return
+        self._notify(model_step, crossed, direction, buffer)
+
+    def _notify(self, model_step, crossed, direction, buffer):
+        sim_grp = model_step.simulation_group
+        time = sim_grp.mf6.get_current_time()
+        offsets = self._offsets
+        for pos, watchpoint in enumerate(self.watchpoints.values()):
+            start, end = offsets[pos], offsets[pos + 1]
+            indices = np.flatnonzero(crossed[start:end])
+            if not indices.size:
+                continue
+            cells = [watchpoint.cells[index] for index in indices]
+            watchpoint.callback(Crossing(
+                name=watchpoint.name,
+                cells=cells,
+                indices=indices,
+                direction=direction[start:end][indices],
+                values=buffer[start:end][indices].copy(),
+                time=time,
+                kper=sim_grp.kper,
+                kstp=sim_grp.kstp,
+            ))
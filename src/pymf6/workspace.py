@@ -0,0 +1,368 @@
+"""Workspaces for running scenarios from a template simulation.
+
+MF6 writes its output into the simulation directory. Therefore, scenarios
+that run at the same time need their own directory. `Workspace` creates
+such a directory from a template without copying the input data:
+
+* reflinks (copy-on-write clones) are used if the file system supports
+  them, e.g. Btrfs, XFS, or APFS
+* hard links are used otherwise; files a scenario changes must be listed
+  in `modified` or made writable with `make_writable()` first
+* files are copied if neither works, e.g. across file systems
+
+Output files and caches of the template are not cloned.
+
+`RamWorkspace` stages a simulation into a RAM-backed directory such as
+`/dev/shm` and copies selected outputs back after the run.
+
+Usage example:
+
+>>> with Workspace('models/template', modified=['*.wel']) as workspace:
+...     write_wel_file(workspace.path)
+...     mf6 = MF6(workspace.path)
+"""
+
+from fnmatch import fnmatch
+import os
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+from threading import Thread
+from warnings import warn
+import weakref
+
+# Files with these extensions are written by MF6.
+OUTPUT_SUFFIXES = ('.hds', '.ucn', '.bud', '.cbc', '.lst', '.grb', '.csv')
+# Files matching these patterns are written by pymf6 next to the model
+# files, e.g. the manifest of `write_simulation_incremental` and the files
+# of `CellTimeSeriesCache`.
+PYMF6_FILE_PATTERNS = ('.pymf6_*', '*.tcache.*')
+LINK_METHODS = ('reflink', 'hardlink', 'copy')
+# ioctl request for cloning a file on Linux (FICLONE)
+FICLONE = 0x40049409
+# Default RAM-backed directory, available on most Linux systems
+RAM_DIR = '/dev/shm'
+
+
+def remove_file(path):
+    """
+    Remove `path` if it exists.
+
+    Writing into an existing file would change all hard links to it,
+    e.g. the file of the template a workspace was linked from.
+    """
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def reflink(src, dst):
+    """Create a copy-on-write clone of `src` at `dst`."""
+    remove_file(dst)
+    if sys.platform.startswith('linux'):
+        import fcntl  # pylint: disable=import-outside-toplevel
+
+        with open(src, 'rb') as src_obj, open(dst, 'xb') as dst_obj:
+            try:
+                fcntl.ioctl(dst_obj.fileno(), FICLONE, src_obj.fileno())
+            except OSError:
+                dst_obj.close()
+                os.unlink(dst)
+                raise
+    elif sys.platform == 'darwin':
+        import ctypes  # pylint: disable=import-outside-toplevel
+
+        libc = ctypes.CDLL('libc.dylib', use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0):
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(dst))
+    else:
+        raise OSError(f'reflinks are not supported on {sys.platform}')
+
+
+def clone_file(src, dst, methods=LINK_METHODS):
+    """
+    Clone `src` to `dst` with the first method in `methods` that works.
+
+    Returns the name of the method used. An existing `dst` is removed
+    first and never written into.
+    """
+    remove_file(dst)
+    for method in methods:
+        try:
+            if method == 'reflink':
+                reflink(src, dst)
+            elif method == 'hardlink':
+                os.link(src, dst)
+            else:
+                shutil.copy2(src, dst)
+            return method
+        except OSError:
+            if method == methods[-1]:
+                raise
+    raise ValueError(f'No valid method in {methods}.')
+
+
+def is_output_file(path):
+    """Check if `path` is a file written by MF6."""
+    return Path(path).suffix.lower() in OUTPUT_SUFFIXES
+
+
+def is_pymf6_file(path):
+    """Check if `path` is a file written by pymf6, e.g. a cache."""
+    name = Path(path).name
+    return any(fnmatch(name, pattern) for pattern in PYMF6_FILE_PATTERNS)
+
+
+def is_input_file(path):
+    """Check if `path` is neither written by MF6 nor by pymf6."""
+    return not (is_output_file(path) or is_pymf6_file(path))
+
+
+class Workspace:
+    """
+    Directory for one scenario cloned from a template simulation.
+
+    `template` - directory of the template simulation
+    `path` - new directory, defaults to a new temporary directory next to
+             the template, i.e. on the same file system
+    `modified` - glob patterns of file names relative to the template that
+                 the scenario changes, these files are never hard-linked
+    `link` - `'auto'` tries `'reflink'`, `'hardlink'`, and `'copy'`
+             in this order, or one of these methods
+    `keep` - keep the directory after leaving the `with` block
+    """
+
+    def __init__(
+            self,
+            template,
+            path=None,
+            modified=(),
+            link='auto',
+            keep=False):
+        self.template = Path(template).resolve()
+        if path is None:
+            path = tempfile.mkdtemp(
+                prefix=f'{self.template.name}_', dir=self.template.parent
+            )
+        self.path = Path(path)
+        self.modified = list(modified)
+        if link == 'auto':
+            self.methods = LINK_METHODS
+        elif link in LINK_METHODS:
+            self.methods = (link,)
+        else:
+            raise ValueError(
+                f'Unknown link method {link}. '
+                f'Use `auto` or one of {LINK_METHODS}.'
+            )
+        self.keep = keep
+        self.stats = {method: 0 for method in LINK_METHODS}
+        self.linked = {}
+        self._create()
+
+    def _is_modified(self, relative_path):
+        name = relative_path.as_posix()
+        return any(fnmatch(name, pattern) for pattern in self.modified)
+
+    def _create(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        methods = self.methods
+        for src in sorted(self.template.rglob('*')):
+            relative_path = src.relative_to(self.template)
+            dst = self.path / relative_path
+            if src.is_dir():
+                dst.mkdir(exist_ok=True)
+                continue
+            if not is_input_file(src):
+                continue
+            file_methods = methods
+            if self._is_modified(relative_path):
+                file_methods = tuple(
+                    method for method in methods if method != 'hardlink'
+                ) or ('copy',)
+            method = clone_file(src, dst, file_methods)
+            self.stats[method] += 1
+            self.linked[relative_path] = method
+            # Do not try methods again that failed for the first file.
+            if file_methods is methods:
+                methods = methods[methods.index(method):]
+
+    def make_writable(self, relative_path):
+        """Replace a hard link by a copy so the file can be changed."""
+        relative_path = Path(relative_path)
+        if self.linked.get(relative_path) != 'hardlink':
+            return
+        dst = self.path / relative_path
+        tmp = dst.with_name(dst.name + '.tmp')
+        shutil.copy2(self.template / relative_path, tmp)
+        os.replace(tmp, dst)
+        self.linked[relative_path] = 'copy'
+        self.stats['hardlink'] -= 1
+        self.stats['copy'] += 1
+
+    def cleanup(self):
+        """Remove the workspace directory."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.keep:
+            self.cleanup()
+
+    def __repr__(self):
+        counts = ', '.join(
+            f'{count} {method}' for method, count in self.stats.items()
+        )
+        return f'Workspace {self.path} from {self.template} ({counts})'
+
+
+def _file_states(path):
+    """Size and modification time of all files below `path`."""
+    return {
+        file_path.relative_to(path): (stat.st_size, stat.st_mtime_ns)
+        for file_path in path.rglob('*')
+        if file_path.is_file() and (stat := file_path.stat())
+    }
+
+
+def _ignore_non_input(directory, names):
+    """Names of the files in `directory` that are not model input."""
+    return [
+        name for name in names
+        if not is_input_file(name) and os.path.isfile(
+            os.path.join(directory, name)
+        )
+    ]
+
+
+class RamWorkspace:
+    """
+    Run a simulation in a RAM-backed directory.
+
+    `sim_path` - directory of the simulation
+    `ram_dir` - RAM-backed directory, defaults to `RAM_DIR`
+    `outputs` - glob patterns of files to copy back after the run,
+                defaults to all new or changed files
+    `reserve_factor` - required free memory as multiple of the input size
+
+    Only input files are staged, see `is_input_file`.
+    If the RAM directory does not exist or has not enough free space,
+    a warning is shown and the simulation runs in `sim_path`.
+    `path` is the directory to run the simulation in.
+
+    The staging directory is removed by `finish()`, by `cleanup()`, or
+    at the latest when the instance is garbage collected or Python exits.
+    """
+
+    def __init__(self, sim_path, ram_dir=None, outputs=None, reserve_factor=3):
+        self.sim_path = Path(sim_path).resolve()
+        self.path = self.sim_path
+        self.outputs = outputs
+        self.active = False
+        self.report = {
+            'bytes_written': 0,
+            'bytes_copied': 0,
+            'bytes_saved': 0,
+            'files_copied': 0,
+        }
+        self._thread = None
+        self._error = None
+        self._finished = False
+        self._remove_staging = None
+        ram_dir = Path(RAM_DIR if ram_dir is None else ram_dir)
+        input_size = sum(
+            file_path.stat().st_size
+            for file_path in self.sim_path.rglob('*')
+            if file_path.is_file() and is_input_file(file_path)
+        )
+        if not ram_dir.is_dir():
+            warn(f'RAM directory {ram_dir} not found. Running in {sim_path}.')
+            return
+        free = shutil.disk_usage(ram_dir).free
+        if free < input_size * reserve_factor:
+            warn(
+                f'Not enough free memory in {ram_dir} ({free} bytes) for '
+                f'{input_size} bytes of input. Running in {sim_path}.'
+            )
+            return
+        path = Path(tempfile.mkdtemp(prefix='pymf6_', dir=ram_dir))
+        try:
+            shutil.copytree(
+                self.sim_path, path, ignore=_ignore_non_input,
+                dirs_exist_ok=True,
+            )
+        except OSError as err:
+            shutil.rmtree(path, ignore_errors=True)
+            warn(f'Staging into {ram_dir} failed: {err}. Running in {sim_path}.')
+            return
+        self.path = path
+        self.active = True
+        self._remove_staging = weakref.finalize(
+            self, shutil.rmtree, path, ignore_errors=True
+        )
+        self._initial_states = _file_states(path)
+
+    def _selected(self, relative_path):
+        if self.outputs is None:
+            return True
+        name = relative_path.as_posix()
+        return any(fnmatch(name, pattern) for pattern in self.outputs)
+
+    def _copy_back(self):
+        try:
+            self._copy_changed()
+        except Exception as err:  # pylint: disable=broad-except
+            # Raised again by `join()` in the calling thread.
+            self._error = err
+        finally:
+            self._remove_staging()
+
+    def _copy_changed(self):
+        changed = {
+            relative_path: state
+            for relative_path, state in _file_states(self.path).items()
+            if self._initial_states.get(relative_path) != state
+        }
+        for relative_path, (size, _) in changed.items():
+            self.report['bytes_written'] += size
+            if self._selected(relative_path):
+                dst = self.sim_path / relative_path
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                remove_file(dst)
+                shutil.copy2(self.path / relative_path, dst)
+                self.report['bytes_copied'] += size
+                self.report['files_copied'] += 1
+        self.report['bytes_saved'] = (
+            self.report['bytes_written'] - self.report['bytes_copied']
+        )
+
+    def finish(self):
+        """Copy outputs back in a background thread and remove the staging."""
+        if not self.active or self._finished:
+            return
+        self._finished = True
+        self._thread = Thread(target=self._copy_back, name='pymf6-copy-back')
+        self._thread.start()
+
+    def cleanup(self):
+        """Remove the staging directory without copying outputs back."""
+        if not self.active or self._finished:
+            return
+        self._finished = True
+        self._remove_staging()
+
+    def join(self):
+        """Wait until all outputs are copied back and return the report.
+
+        Errors of copying in the background thread are raised here.
+        """
+        if self._thread is not None:
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.report
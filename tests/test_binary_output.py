@@ -0,0 +1,55 @@
+"""Tests of `pymf6.modeling_tools.binary_output`."""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+# pylint: disable=wrong-import-position
+from pymf6.modeling_tools.binary_output import (
+    BinaryOutputFile,
+    make_record_dtype,
+)
+
+NROW, NCOL = 2, 3
+
+
+def write_head_records(path, layers):
+    """
+    Write head records, one per entry of `layers`.
+
+    `layers` - list of (kstp, ilay), the values are `kstp * 10 + ilay`
+    """
+    records = np.zeros(len(layers), dtype=make_record_dtype(NCOL, NROW))
+    for record, (kstp, ilay) in zip(records, layers):
+        record['kstp'] = kstp
+        record['kper'] = 1
+        record['pertim'] = record['totim'] = float(kstp)
+        record['text'] = b'HEAD'.rjust(16)
+        record['ncol'] = NCOL
+        record['nrow'] = NROW
+        record['ilay'] = ilay
+        record['data'] = kstp * 10 + ilay
+    with open(path, 'ab') as fobj:
+        fobj.write(records.tobytes())
+
+
+def test_nlay_not_inferred_in_first_step(tmp_path):
+    """Only the first layers of the first step give no number of layers."""
+    path = tmp_path / 'model.hds'
+    write_head_records(path, [(1, 1), (1, 2)])
+    heads = BinaryOutputFile(path)
+    assert heads.nlay is None
+    assert heads.nsteps == 0
+    write_head_records(path, [(1, 3), (2, 1)])
+    assert heads.refresh() == 1
+    assert heads.nlay == 3
+    assert heads.read_step(0)[:, 0, 0].tolist() == [11, 12, 13]
+
+
+def test_given_nlay(tmp_path):
+    """A file with one time step needs `nlay`."""
+    path = tmp_path / 'model.hds'
+    write_head_records(path, [(1, 1), (1, 2)])
+    heads = BinaryOutputFile(path, nlay=2)
+    assert heads.nsteps == 1
+    assert heads.shape == (2, NROW, NCOL)
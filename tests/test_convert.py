@@ -0,0 +1,79 @@
+"""Tests of `pymf6.modeling_tools.convert`."""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('flopy')
+pytest.importorskip('xarray')
+pytest.importorskip('dask')
+
+# pylint: disable=wrong-import-position
+from flopy.utils import CellBudgetFile
+
+from pymf6.modeling_tools.convert import (
+    _find_budget_names,
+    _read_budget_steps,
+)
+
+SHAPE = (1, 2, 3)
+
+
+def write_budget_file(path, records):
+    """
+    Write a budget file with full arrays in the compact MF6 format.
+
+    `records` - list of (kstp, kper, text, values) with one-based steps
+    """
+    header = np.dtype([
+        ('kstp', '<i4'), ('kper', '<i4'), ('text', 'S16'),
+        ('ncol', '<i4'), ('nrow', '<i4'), ('nlay', '<i4'),
+        ('imeth', '<i4'), ('delt', '<f8'), ('pertim', '<f8'),
+        ('totim', '<f8'),
+    ])
+    with open(path, 'wb') as fobj:
+        for kstp, kper, text, values in records:
+            values = np.asarray(values, dtype='<f8')
+            if text == 'FLOW-JA-FACE':
+                ncol, nrow, nlay = values.size, 1, 1
+            else:
+                nlay, nrow, ncol = SHAPE
+            np.array(
+                [(kstp, kper, text.rjust(16).encode('ascii'), ncol, nrow,
+                  -nlay, 1, 1.0, float(kstp), float(kstp))],
+                dtype=header,
+            ).tofile(fobj)
+            values.tofile(fobj)
+
+
+@pytest.fixture(name='bud_path')
+def fixture_bud_path(tmp_path):
+    path = tmp_path / 'model.bud'
+    ncells = np.prod(SHAPE)
+    records = []
+    for kstp in (1, 2):
+        records.append((kstp, 1, 'FLOW-JA-FACE', np.zeros(10)))
+        records.append((kstp, 1, 'STO-SS', np.arange(ncells) + kstp))
+        records.append((kstp, 1, 'CHD', -np.arange(ncells) * kstp))
+    write_budget_file(path, records)
+    return path
+
+
+def test_find_budget_names(bud_path):
+    """All grid terms except FLOW-JA-FACE are found."""
+    budget = CellBudgetFile(str(bud_path), precision='double')
+    names = _find_budget_names(budget, np.prod(SHAPE))
+    budget.close()
+    assert names == ['STO-SS', 'CHD']
+
+
+def test_read_budget_steps(bud_path):
+    """Budget terms are read as full grid arrays by time step."""
+    data = _read_budget_steps(
+        bud_path, ['STO-SS', 'CHD'], SHAPE, 0, 2, 'double'
+    )
+    ncells = np.prod(SHAPE)
+    assert data['STO-SS'].shape == (2,) + SHAPE
+    np.testing.assert_allclose(
+        data['STO-SS'][1].ravel(), np.arange(ncells) + 2
+    )
+    np.testing.assert_allclose(data['CHD'][1].ravel(), -np.arange(ncells) * 2)
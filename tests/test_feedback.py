@@ -0,0 +1,39 @@
+"""Tests of `pymf6.feedback`."""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+# pylint: disable=wrong-import-position
+from pymf6.feedback import PIDController
+
+
+def test_anti_windup_negative_ki():
+    """With negative `ki`, the integral stops at both output limits."""
+    pid = PIDController(
+        model='gwt', package='wel_0', wells=[0, 1], setpoint=1.0,
+        kp=0.0, ki=-1.0, output_limits=(-1.0, 0.0),
+    )
+    pid._new_step(np.zeros(2))  # pylint: disable=protected-access
+    # concentration too high: the output exceeds the upper limit,
+    # concentration too low: the output is below the lower limit
+    measured = np.array([3.0, -2.0])
+    error = pid.setpoint - measured
+    # pylint: disable=protected-access
+    output = pid._compute(measured, error, 1.0, pid.bias)
+    assert output[0] > pid.upper[0]
+    assert output[1] < pid.lower[1]
+    assert (pid._step_integral == 0).all()
+
+
+def test_integral_within_limits():
+    """The integral grows while the output is within the limits."""
+    pid = PIDController(
+        model='gwt', package='wel_0', wells=[0], setpoint=1.0,
+        kp=0.0, ki=-1.0, output_limits=(-10.0, 10.0),
+    )
+    pid._new_step(np.zeros(1))  # pylint: disable=protected-access
+    measured = np.array([1.5])
+    # pylint: disable=protected-access
+    pid._compute(measured, pid.setpoint - measured, 2.0, pid.bias)
+    assert pid._step_integral[0] == pytest.approx(-1.0)
@@ -0,0 +1,66 @@
+"""Tests of `pymf6.modeling_tools.make_model`."""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('flopy')
+
+# pylint: disable=wrong-import-position
+from pymf6.modeling_tools.base_model import make_model_data
+from pymf6.modeling_tools.make_model import (
+    MANIFEST_NAME,
+    make_input,
+)
+
+
+@pytest.fixture
+def model_data(tmp_path):
+    """Data of a small model in a temporary directory."""
+    return make_model_data({
+        'name': 'incr',
+        'model_path': str(tmp_path / 'incr'),
+    })
+
+
+def test_incremental_keeps_binary_references(model_data, tmp_path):
+    """The packages refer to the binary arrays instead of inlining them."""
+    make_input(model_data, binary_arrays=True, incremental=True)
+    model_path = tmp_path / 'incr'
+    npf_text = (model_path / 'incr.npf').read_text(encoding='utf-8')
+    assert "OPEN/CLOSE  'incr.k.bin'" in npf_text
+    assert '(BINARY)' in npf_text
+    dis_text = (model_path / 'incr.dis').read_text(encoding='utf-8')
+    assert "OPEN/CLOSE  'incr.botm.bin'" in dis_text
+    assert (model_path / MANIFEST_NAME).exists()
+
+
+def test_incremental_writes_only_changes(model_data, tmp_path):
+    """Unchanged packages are not written again."""
+    make_input(model_data, binary_arrays=True, incremental=True)
+    model_path = tmp_path / 'incr'
+    npf_path = model_path / 'incr.npf'
+    wel_path = model_path / 'incr.wel'
+    npf_mtime = npf_path.stat().st_mtime_ns
+    wel_text = wel_path.read_text(encoding='utf-8')
+    model_data['wells'] = {
+        'wel_out': {'q': (-0.1, -0.5, -0.05), 'coords': (0, 4, 4)},
+    }
+    make_input(model_data, binary_arrays=True, incremental=True)
+    assert npf_path.stat().st_mtime_ns == npf_mtime
+    assert wel_path.read_text(encoding='utf-8') != wel_text
+    assert not list(model_path.glob('*.tmp'))
+
+
+def test_steady_state_hash(model_data, tmp_path):
+    """The hash covers all values of large arrays and nothing else."""
+    spinup_cache = tmp_path / 'spinup'
+    shape = (1, 50, 50)
+    k = np.full(shape, 0.5)
+    hashes = []
+    for k_middle, ss in [(0.5, 1e-6), (0.5, 1e-5), (0.6, 1e-6)]:
+        k[0, 25, 25] = k_middle
+        data = model_data | {'nrow': 50, 'ncol': 50, 'k': k, 'ss': ss}
+        make_input(data, spinup_cache=spinup_cache)
+        hashes.append(data['spinup_hash'])
+    assert hashes[0] == hashes[1]
+    assert hashes[0] != hashes[2]